@@ -18,8 +18,6 @@ import sys
 import os
 import platform
 
-import torch
-
 # IMPORT / GUI AND MODULES AND WIDGETS
 # ///////////////////////////////////////////////////////////////
 from modules import *
@@ -30,6 +28,8 @@ os.environ["QT_FONT_DPI"] = "96" # FIX Problem for High DPI and Scale above 100%
 # ///////////////////////////////////////////////////////////////
 from modules.ai_functions import AIClass
 from modules.image_functions import ImageClass
+from pguard import PipelineConfig
+from pguard.dnn_functions import RESULT_KEYS
 
 # SET AS GLOBAL WIDGETS
 # ///////////////////////////////////////////////////////////////
@@ -53,14 +53,13 @@ class MainWindow(QMainWindow):
         self.ControlKey = False
 
         # AI Variables
-        self.device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
-        self.score_thr = 0.7
-        self.text_prompt = "manhole"
+        self.ai_config = PipelineConfig(self.home)
 
         self.image_src_folder = ""
         self.image_save_folder = os.path.join(self.home, "init", "results")
-        # image: 이미지 이름. dino_bbox: 탐지된 바운딩 박스의 리스트, dino_score: 탐지된 바운딩 박스의 스코어 리스트, resnet: 0-개구부 아님, 1-정상 개구부, 2-불량 개구부
-        self.ai_result_dict = {"image": [], "image_path": [], "dino_bbox": [], "dino_score": [], "resnet": []}
+        # image: 이미지 이름. dino_raw: threshold 이전 탐지 결과, dino_bbox: 탐지된 바운딩 박스의 리스트, dino_score: 탐지된 바운딩 박스의 스코어 리스트,
+        # dino_label: 탐지 클래스, resnet_code: threshold와 무관한 ResNet 결과(None-미분류), resnet: 0-개구부 아님, 1-정상 개구부, 2-불량 개구부
+        self.ai_result_dict = {key: [] for key in RESULT_KEYS}
 
         # Image Variables
         self.fileModel = QFileSystemModel()
@@ -169,6 +168,13 @@ class MainWindow(QMainWindow):
             btn.setStyleSheet(UIFunctions.selectMenu(btn.styleSheet())) # SELECT MENU
 
 
+    # CLOSE EVENT
+    # ///////////////////////////////////////////////////////////////
+    def closeEvent(self, event):
+        # Stop Running Inference Thread
+        self.ai.stopInference()
+        event.accept()
+
     # RESIZE EVENTS
     # ///////////////////////////////////////////////////////////////
     def resizeEvent(self, event):
@@ -1,36 +1,53 @@
 import os
 
-from PIL import Image
 import numpy as np
 import pandas as pd
-import cv2
-
-from mmdet.apis import init_detector, inference_detector
-from mmpretrain import ImageClassificationInferencer
 
 from PySide6.QtWidgets import QFileDialog, QStyledItemDelegate, QHeaderView
-from PySide6.QtCore import Qt, QAbstractTableModel
+from PySide6.QtCore import (Qt, QAbstractTableModel, QModelIndex, QObject, QThread, QTimer, QFileSystemWatcher, Signal,
+                            Slot)
 from PySide6.QtGui import QColor
 
-from .utils import nms_numpy
+from pguard.config import RESOLUTION_PROFILES
+from pguard.dnn_functions import RESULT_KEYS
+from pguard.loader import load_pipeline_async
+from pguard.pipeline import (CLASSIFICATION_MAP, DECISION_MAP, count_frames, format_stage_counts, list_inputs,
+                             save_result_image)
+from pguard.prompt_cache import PromptNotCachedError
+from pguard.video import parse_frame_key
+from pguard.watch import FolderWatcher, watch_index_path
+
+from .ai_worker import InferenceWorker
 
 class DataFrameModel(QAbstractTableModel):
     def __init__(self, df: pd.DataFrame):
         super().__init__()
-        self._df = df
+        # 행 단위로 추가되므로 DataFrame 대신 리스트로 보관
+        self._columns = list(df.columns)
+        self._rows = df.values.tolist()
 
     def rowCount(self, parent=None):
-        return self._df.shape[0]
+        return len(self._rows)
 
     def columnCount(self, parent=None):
-        return self._df.shape[1]
+        return len(self._columns)
+
+    def appendRow(self, row):
+        position = len(self._rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.append(list(row))
+        self.endInsertRows()
+
+    def updateRow(self, position, row):
+        self._rows[position] = list(row)
+        self.dataChanged.emit(self.index(position, 0), self.index(position, len(self._columns) - 1))
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
             return None
 
         if role == Qt.DisplayRole:
-            value = self._df.iat[index.row(), index.column()]
+            value = self._rows[index.row()][index.column()]
             return str(value)
         elif role == Qt.TextAlignmentRole:
             return Qt.AlignCenter
@@ -42,9 +59,9 @@ class DataFrameModel(QAbstractTableModel):
             return None
 
         if orientation == Qt.Horizontal:
-            return self._df.columns[section]
+            return self._columns[section]
         elif orientation == Qt.Vertical:
-            return str(self._df.index[section])
+            return str(section)
 
 
 class HoverRowDelegate(QStyledItemDelegate):
@@ -63,118 +80,325 @@ class HoverRowDelegate(QStyledItemDelegate):
         super().paint(painter, option, index)
 
 
-class AIClass():
+class AIClass(QObject):
+    # Table Definition
+    TABLE_COLUMNS = ["번호(No.)", "이미지 이름", "분류", "판정", "개구부 존재 확률(%)", "이미지 경로"]
+    CLASSIFICATION_MAP = CLASSIFICATION_MAP
+    DECISION_MAP = DECISION_MAP
+
+    # Model Loading (emitted from the loading thread)
+    modelProgress = Signal(str)
+    modelLoaded = Signal()
+
     def __init__(self, ui, main_window):
+        super().__init__()
         # Inherit Class
         self.ui = ui
         self.main = main_window
 
-        # Load AI Model
-        GDINO_CONFIG_PATH = os.path.join(self.main.home, "init", "dnn", "config", "grounding_dino.py")
-        GDINO_CHECKPOINT_PATH = os.path.join(self.main.home, "init", "dnn", "checkpoint", "grounding_dino.pth")
-        self.main.gdino_model = init_detector(GDINO_CONFIG_PATH, GDINO_CHECKPOINT_PATH, device=self.main.device)
-
-        RESNET_CONFIG_PATH = os.path.join(self.main.home, "init", "dnn", "config", "resnet.py")
-        RESNET_CHECKPOINT_PATH = os.path.join(self.main.home, "init", "dnn", "checkpoint", "resnet.pth")
-        self.main.resnet_model = ImageClassificationInferencer(
-            model=RESNET_CONFIG_PATH,
-            pretrained=RESNET_CHECKPOINT_PATH,
-            device=self.main.device
-        )
+        # Load AI Model (Qt-free pipeline, background thread after the window is shown)
+        self.pipeline_future = None
+        self.modelProgress.connect(self.updateModelProgress)
+        self.modelLoaded.connect(self.modelLoadingFinished)
+        QTimer.singleShot(0, self.loadModels)
+
+        # Inference Thread
+        self.inference_thread = None
+        self.inference_worker = None
+        self.inference_failed = False
+        self.table_model = None
+
+        # Watch Folder
+        self.folder_watcher = None
+        self.processed_paths = []
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
 
         # Function Connection
         self.ui.ImageFolderButton.clicked.connect(self.selectImageFolder)
-        self.ui.ImageFolderButton.clicked.connect(self.saveResult)
+        self.ui.SaveImageButton.clicked.connect(self.saveResult)
         self.ui.gdinoThresholdButton.clicked.connect(self.changethr)
+        self.ui.PauseInferenceButton.clicked.connect(self.togglePauseInference)
+        self.ui.CancelInferenceButton.clicked.connect(self.cancelInference)
+        self.ui.WatchFolderButton.toggled.connect(self.toggleWatchFolder)
+        self.fs_watcher.directoryChanged.connect(self.scheduleWatchPoll)
+        self.watch_timer.timeout.connect(self.pollWatchFolder)
+
+        # Resolution Profile
+        self.ui.ResolutionComboBox.setCurrentText(self.main.ai_config.resolution_profile)
+        self.ui.ResolutionComboBox.currentTextChanged.connect(self.changeResolution)
 
         # Initialize Class
         print("load ai class")
-    
+
+    def loadModels(self):
+        self.ui.InferenceProgressBar.setRange(0, 0) # busy
+        self.pipeline_future = load_pipeline_async(self.main.ai_config, progress=self.modelProgress.emit)
+        self.pipeline_future.add_done_callback(lambda future: self.modelLoaded.emit())
+
+    @Slot(str)
+    def updateModelProgress(self, message):
+        print(message)
+        self.ui.InferenceEtaLabel.setText(f"Loading: {message}")
+
+    @Slot()
+    def modelLoadingFinished(self):
+        if self.pipeline_future.exception() is not None:
+            print(f"Model loading failed: {self.pipeline_future.exception()}")
+            self.ui.InferenceEtaLabel.setText("Model loading failed")
+        else:
+            print("Models loaded")
+            self.ui.InferenceEtaLabel.setText("ETA: -")
+
+        if self.inference_thread is None:
+            self.ui.InferenceProgressBar.setRange(0, 1)
+            self.ui.InferenceProgressBar.setValue(0)
+
+    def loadedPipeline(self):
+        # None while loading or after a loading error
+        if self.pipeline_future is None or not self.pipeline_future.done():
+            return None
+        if self.pipeline_future.exception() is not None:
+            return None
+        return self.pipeline_future.result()
+
+    def runPipeline(self, image_paths):
+        # Worker thread: wait for the models, then Pipeline.run
+        try:
+            pipeline = self.pipeline_future.result()
+        except Exception:
+            return # reported by modelLoadingFinished
+
+        # Check Text Prompt (Frozen Prompt Mode)
+        try:
+            pipeline.checkPrompt()
+        except PromptNotCachedError as e:
+            print(e)
+            return
+
+        yield from pipeline.run(image_paths)
+
     def selectImageFolder(self):
         # Select Folder
-        self.main.image_src_folder = str(QFileDialog.getExistingDirectory(self, "Select Image Folder"))
+        image_src_folder = str(QFileDialog.getExistingDirectory(self.main, "Select Image Folder"))
+        if image_src_folder == "":
+            return
+        self.main.image_src_folder = image_src_folder
         self.ui.ImageFolderLineEdit.setText(str(self.main.image_src_folder))
 
+        # Watch Folder (Persisted Processed Index)
+        self.ui.WatchFolderButton.setChecked(False)
+        self.folder_watcher = FolderWatcher(
+            image_src_folder, watch_index_path(self.main.ai_config.dnn_cache_folder, image_src_folder),
+            settle_seconds=self.main.ai_config.watch_settle_seconds
+        )
+        self.ui.WatchFolderButton.setEnabled(True)
+
         # Initialize Result Dict
-        self.ai_result_dict = {"image": [], "image_path": [], "dino_bbox": [], "dino_score": [], "resnet": []}
+        self.main.ai_result_dict = {key: [] for key in RESULT_KEYS}
 
         # Call AI Calculation
         self.readImageFolder()
     
     def readImageFolder(self):
-        image_list = [file for file in os.listdir(self.main.image_src_folder) if file.endswith((".jpg", ".png"))]
-
-        for image_name in image_list:
-            # Load Image
-            image_path = os.path.join(self.main.image_src_folder, image_name)
-            image = np.array(Image.open(image_path))
-            self.main.ai_result_dict["image"].append(image_name)
-            self.main.ai_result_dict["image_path"].append(image_path)
-
-            # Grounding DINO
-            dino_result = inference_detector(self.main.gdino_model, image, text_prompt=self.main.text_prompt)
-
-            bboxes = dino_result.pred_instances.bboxes.cpu().numpy()
-            scores = dino_result.pred_instances.scores.cpu().numpy()
-            labels = dino_result.pred_instances.labels.cpu().numpy()
-
-            filtered_bboxes = bboxes[scores > self.main.score_thr]
-            filtered_scores = scores[scores > self.main.score_thr]
-            filtered_labels = labels[scores > self.main.score_thr]
-
-            keep_indices = nms_numpy(filtered_bboxes, filtered_scores, iou_threshold=0.5)
-            nms_bboxes = filtered_bboxes[keep_indices]
-            nms_scores = filtered_scores[keep_indices]
-            nms_labels = filtered_labels[keep_indices]
-
-            self.main.ai_result_dict["dino_bbox"].append(nms_bboxes)
-            self.main.ai_result_dict["dino_score"].append(nms_scores)
-
-            # ResNet
-            if len(nms_bboxes) >= 1:
-                resnet_result = self.main.resnet_model(image)
-                resnet_class = resnet_result[0]['pred_class']
-                if resnet_class == 'Y-03':
-                    final_cls = 1
-                elif resnet_class == 'N-03':
-                    final_cls = 2
-                else:
-                    final_cls = 0
-            else:
-                final_cls = 0
-            
-            self.main.ai_result_dict["resnet"].append(final_cls)
-        
-        # Call Plot Function
-        print("Calculation Complete")
+        # Images and videos (one row per sampled video frame)
+        image_paths = list_inputs(self.main.image_src_folder)
+        total = count_frames(image_paths, self.main.ai_config.video_sample_interval)
+
+        # Empty Table (Rows are appended as results arrive)
         self.showTable()
+
+        # Run Inference on Worker Thread
+        self.startWorker(image_paths, self.runPipeline, self.appendResult, total)
+
+    def startWorker(self, items, run_fn, result_slot, total=None):
+        self.inference_thread = QThread()
+        self.inference_worker = InferenceWorker(items, run_fn, total)
+        self.inference_worker.moveToThread(self.inference_thread)
+
+        self.inference_thread.started.connect(self.inference_worker.run)
+        self.inference_worker.resultReady.connect(result_slot)
+        self.inference_worker.progressChanged.connect(self.updateProgress)
+        self.inference_worker.error.connect(self.inferenceFailed)
+        self.inference_worker.finished.connect(self.inferenceFinished)
+        self.inference_worker.finished.connect(self.inference_thread.quit)
+        self.inference_worker.finished.connect(self.inference_worker.deleteLater)
+        self.inference_thread.finished.connect(self.inference_thread.deleteLater)
+
+        self.ui.InferenceProgressBar.setRange(0, max(self.inference_worker.total, 1))
+        self.ui.InferenceProgressBar.setValue(0)
+        self.ui.InferenceEtaLabel.setText("ETA: -")
+        self.setInferenceRunning(True)
+
+        self.inference_thread.start()
+
+    @Slot(dict)
+    def appendResult(self, result):
+        for key in self.main.ai_result_dict.keys():
+            self.main.ai_result_dict[key].append(result[key])
+        if parse_frame_key(result["image_path"]) is None: # watch folder index holds image files only
+            self.processed_paths.append(result["image_path"])
+
+        row_idx = len(self.main.ai_result_dict["image"]) - 1
+        self.table_model.appendRow(self.makeTableRow(row_idx))
+
+        if row_idx == 0:
+            self.ui.ImageTableView.resizeColumnsToContents()
+
+    @Slot(dict)
+    def updateResult(self, result):
+        row_idx = result["row_idx"]
+        for key in self.main.ai_result_dict.keys():
+            self.main.ai_result_dict[key][row_idx] = result[key]
+
+        self.table_model.updateRow(row_idx, self.makeTableRow(row_idx))
+
+    @Slot(int, int, float)
+    def updateProgress(self, done, total, eta):
+        self.ui.InferenceProgressBar.setMaximum(total)
+        self.ui.InferenceProgressBar.setValue(done)
+        hours, remainder = divmod(int(eta), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        self.ui.InferenceEtaLabel.setText(f"{done}/{total}  ETA: {hours:02d}:{minutes:02d}:{seconds:02d}")
+
+    @Slot(str)
+    def inferenceFailed(self, message):
+        # finished follows, the controls are enabled again there
+        self.inference_failed = True
+        self.ui.InferenceEtaLabel.setText(f"오류: {message}")
+
+    @Slot()
+    def inferenceFinished(self):
+        detection_run = self.inference_worker.run_fn == self.runPipeline
+        failed = self.inference_failed
+        self.inference_thread = None
+        self.inference_worker = None
+        self.inference_failed = False
+        self.setInferenceRunning(False)
+        print("Calculation Complete")
+
+        # Frames eliminated by each stage (cascade -> detector -> classifier)
+        if detection_run and self.loadedPipeline() is not None:
+            stage_counts = format_stage_counts(self.loadedPipeline().stage_counts)
+            print(stage_counts)
+            self.ui.InferenceEtaLabel.setToolTip(stage_counts)
+
+            # Inferences saved by near-duplicate skipping
+            duplicates = self.loadedPipeline().stage_counts["duplicates"]
+            if duplicates >= 1:
+                self.ui.InferenceEtaLabel.setText(f"{self.ui.InferenceEtaLabel.text()}  (중복 {duplicates}장 추론 생략)")
+
+        if self.folder_watcher is not None and len(self.processed_paths) >= 1:
+            self.folder_watcher.markProcessed(self.processed_paths)
+        self.processed_paths = []
+
+        # Images that arrived during the run (not after a failure, the next folder change retries)
+        if self.ui.WatchFolderButton.isChecked() and not failed:
+            self.scheduleWatchPoll()
+
+    def toggleWatchFolder(self, checked):
+        if self.fs_watcher.directories():
+            self.fs_watcher.removePaths(self.fs_watcher.directories())
+
+        if checked and self.folder_watcher is not None:
+            self.fs_watcher.addPath(self.folder_watcher.folder)
+            self.scheduleWatchPoll()
+        else:
+            self.watch_timer.stop()
+
+    def scheduleWatchPoll(self, path=None):
+        # Poll watch_settle_seconds after the first change (not restarted by later changes, so steady uploads
+        # are still processed), FolderWatcher.poll waits for each file to settle
+        if not self.watch_timer.isActive():
+            self.watch_timer.start(int(self.main.ai_config.watch_settle_seconds * 1000))
+
+    def pollWatchFolder(self):
+        if not self.ui.WatchFolderButton.isChecked() or self.folder_watcher is None:
+            return
+
+        if self.inference_thread is not None:
+            # Polled again when the current run finishes
+            return
+
+        new_image_paths = self.folder_watcher.poll()
+        if len(new_image_paths) >= 1:
+            if self.table_model is None:
+                self.showTable()
+            self.startWorker(new_image_paths, self.runPipeline, self.appendResult)
+        elif self.folder_watcher.hasPending():
+            # Files still being written
+            self.scheduleWatchPoll()
+
+    def setInferenceRunning(self, running):
+        self.ui.ImageFolderButton.setEnabled(not running)
+        self.ui.SaveImageButton.setEnabled(not running)
+        self.ui.gdinoThresholdButton.setEnabled(not running)
+        self.ui.ResolutionComboBox.setEnabled(not running)
+        self.ui.PauseInferenceButton.setEnabled(running)
+        self.ui.CancelInferenceButton.setEnabled(running)
+        self.ui.PauseInferenceButton.setText("Pause")
+
+    def togglePauseInference(self):
+        if self.inference_worker is None:
+            return
+
+        if self.inference_worker.isPaused():
+            self.inference_worker.resume()
+            self.ui.PauseInferenceButton.setText("Pause")
+        else:
+            self.inference_worker.pause()
+            self.ui.PauseInferenceButton.setText("Resume")
+
+    def cancelInference(self):
+        if self.inference_worker is not None:
+            self.inference_worker.cancel()
+
+    def stopInference(self):
+        # Called on application close
+        if self.inference_thread is not None:
+            self.inference_worker.cancel()
+            self.inference_thread.quit()
+            self.inference_thread.wait()
+
+        # A load in progress is closed when it finishes
+        if self.pipeline_future is not None:
+            self.pipeline_future.add_done_callback(
+                lambda future: future.exception() is None and future.result().close()
+            )
+
+    def makeTableRow(self, idx):
+        scores = self.main.ai_result_dict["dino_score"][idx]
+        if len(scores) >= 1:
+            score = str(round(np.max(scores) * 100, 2))
+        else:
+            score = "0.00"
+
+        return [
+            idx + 1,
+            self.main.ai_result_dict["image"][idx],
+            self.CLASSIFICATION_MAP.get(self.main.ai_result_dict["resnet"][idx], "분류 중"),
+            self.makeDecisionText(idx),
+            score,
+            self.main.ai_result_dict["image_path"][idx]
+        ]
     
-    def showTable(self):
-        # Definition Part
-        classification_map = {0: "개구부 없음", 1: "정상", 2: "비정상(열림)"}
+    def makeDecisionText(self, idx):
+        decision = self.DECISION_MAP[self.main.ai_result_dict["decided_by"][idx]]
+        duplicate_of = self.main.ai_result_dict["duplicate_of"][idx]
+        if duplicate_of is not None:
+            # Inherited from the representative frame
+            decision += f" ← {os.path.basename(duplicate_of)}"
+        return decision
 
+    def showTable(self):
         # Make DataFrame
-        score_list_for_df = []
-        for scores in self.main.ai_result_dict["dino_score"]:
-            if len(scores) >= 1:
-                score = str(round(np.max(scores) * 100, 2))
-            else:
-                score = "0.00"
-            score_list_for_df.append(score)
-            
-        dict_for_df = {
-            "번호(No.)": list(range(1, len(self.main.ai_result_dict["image"]) + 1)),
-            "이미지 이름": self.main.ai_result_dict["image"],
-            "분류": [classification_map[cls_code] for cls_code in self.main.ai_result_dict["resnet"]],
-            "개구부 존재 확률(%)": score_list_for_df,
-            "이미지 경로": self.main.ai_result_dict["image_path"]
-        }
+        rows = [self.makeTableRow(idx) for idx in range(len(self.main.ai_result_dict["image"]))]
+        df_for_show = pd.DataFrame(rows, columns=self.TABLE_COLUMNS)
 
         # Show DataFrame
-        df_for_show = pd.DataFrame(dict_for_df)
-
-        model = DataFrameModel(df_for_show)
-        self.ui.ImageTableView.setModel(model)
+        self.table_model = DataFrameModel(df_for_show)
+        self.ui.ImageTableView.setModel(self.table_model)
         
         self.ui.ImageTableView.verticalHeader().setVisible(False)
         self.ui.ImageTableView.horizontalHeader().setMinimumSectionSize(100)
@@ -183,10 +407,13 @@ class AIClass():
     
     def clearTable(self):
         self.ui.ImageTableView.setModel(None)
-        self.main.ai_result_dict = {"image": [], "image_path": [], "dino_bbox": [], "dino_score": [], "resnet": []}
+        self.table_model = None
+        self.main.ai_result_dict = {key: [] for key in RESULT_KEYS}
     
     def saveResult(self):
-        if len(self.main.ai_result_dict["image"]) <= 0:
+        if self.inference_thread is not None:
+            print("모델 연산이 진행 중입니다.")
+        elif len(self.main.ai_result_dict["image"]) <= 0:
             print("모델 연산 결과가 없습니다.")
         else:
             # 1. Make New Dict(resnet=2)
@@ -198,40 +425,45 @@ class AIClass():
             print(filtered_dict)
 
             # 2. Save Images
-            for idx, image_name in enumerate(filtered_dict["image"]):
-                # Read Data
-                src_image_path = filtered_dict["image_path"][idx]
-                image = np.array(Image.open(src_image_path))
-                bboxes = filtered_dict["dino_bbox"][idx]
-                scores = filtered_dict["dino_score"][idx]
-
-                # Plot
-                plot_image = image.copy()
-
-                for bbox, score in zip(bboxes, scores):
-                    x1, y1, x2, y2 = bbox.astype(int)
-                    
-                    text = f'비정상 개구부 {score:.2f}'
-                    
-                    cv2.rectangle(plot_image, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    
-                    (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
-                    cv2.rectangle(plot_image, (x1, y1 - 25), (x1 + w, y1 - 5), (0, 0, 255), -1)
-                    cv2.putText(plot_image, text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-                
-                # Write Image
-                dst_image_path = os.path.join(self.main.image_save_folder, image_name)
-                Image.fromarray(plot_image).save(dst_image_path)
+            for idx in range(len(filtered_dict["image"])):
+                save_result_image({key: value_list[idx] for key, value_list in filtered_dict.items()},
+                                  self.main.image_save_folder)
             
             # 3. Initialization
             self.InitializeAIFunc()
         
     def InitializeAIFunc(self):
+        self.ui.WatchFolderButton.setChecked(False)
         self.image_src_folder = ""
         self.ui.ImageFolderLineEdit.setText(str(self.main.image_src_folder))
         self.clearTable()
     
     def changethr(self):
-        self.main.score_thr = float(self.ui.gdinoThresholdLineEdit.text())
-        self.ui.gdinoThresholdLabel.setText(f"Current Threshold: {self.main.score_thr}")
+        self.main.ai_config.score_thr = float(self.ui.gdinoThresholdLineEdit.text())
+        self.ui.gdinoThresholdLabel.setText(f"Current Threshold: {self.main.ai_config.score_thr}")
         self.ui.gdinoThresholdLineEdit.setText("")
+
+        # Re-filter Current Results (No Detector Run)
+        if len(self.main.ai_result_dict["image"]) >= 1:
+            self.applyThreshold()
+
+    def changeResolution(self, resolution_profile):
+        # Applies to the next folder run (cached results are kept per profile)
+        self.main.ai_config.resolution_profile = resolution_profile
+        print(f"Input Resolution: {resolution_profile} {RESOLUTION_PROFILES[resolution_profile]}")
+
+    def applyThreshold(self):
+        results = [
+            {key: value_list[idx] for key, value_list in self.main.ai_result_dict.items()}
+            for idx in range(len(self.main.ai_result_dict["image"]))
+        ]
+        pipeline = self.pipeline_future.result() # results exist, so the models are loaded
+        results = pipeline.rethreshold(results)
+
+        self.main.ai_result_dict = {key: [result[key] for result in results] for key in RESULT_KEYS}
+        self.showTable()
+
+        # ResNet only for images that newly crossed the threshold
+        pending_results = [dict(result, row_idx=idx) for idx, result in enumerate(results) if result["resnet"] is None]
+        if len(pending_results) >= 1:
+            self.startWorker(pending_results, pipeline.runClassification, self.updateResult)
@@ -0,0 +1,87 @@
+import time
+
+from PySide6.QtCore import QObject, QMutex, QWaitCondition, Signal, Slot
+
+
+class InferenceWorker(QObject):
+    # resultReady: 이미지 한 장의 결과, progressChanged: (완료 수, 전체 수, 남은 시간[s])
+    # error: run_fn 예외 메시지 (finished는 항상 emit)
+    resultReady = Signal(dict)
+    progressChanged = Signal(int, int, float)
+    error = Signal(str)
+    finished = Signal()
+
+    def __init__(self, image_paths, run_fn, total=None):
+        # run_fn: list of image path -> generator of result dict (pguard.Pipeline.run)
+        # total: number of results (videos yield one per sampled frame), None: len(image_paths)
+        super().__init__()
+        self.image_paths = image_paths
+        self.run_fn = run_fn
+        self.total = total if total is not None else len(image_paths)
+
+        self._mutex = QMutex()
+        self._pause_cond = QWaitCondition()
+        self._paused = False
+        self._cancelled = False
+
+    @Slot()
+    def run(self):
+        total = self.total
+        start_time = time.perf_counter()
+        paused_time = 0.0
+
+        results = None
+        try:
+            results = self.run_fn(self.image_paths)
+            for done, result in enumerate(results, 1):
+                self.resultReady.emit(result)
+
+                # Progress / ETA
+                elapsed = time.perf_counter() - start_time - paused_time
+                total = max(total, done) # video totals come from the container frame count
+                eta = elapsed / done * (total - done)
+                self.progressChanged.emit(done, total, eta)
+
+                # Pause / Cancel
+                paused_time += self._waitWhilePaused()
+                if self._cancelled:
+                    break
+        except Exception as e:
+            # Corrupt image, lost model server, out of memory, ...
+            print(f"Inference failed: {e!r}")
+            self.error.emit(f"{type(e).__name__}: {e}")
+        finally:
+            if results is not None:
+                results.close()
+            self.finished.emit()
+
+    def _waitWhilePaused(self):
+        waited = 0.0
+        self._mutex.lock()
+        if self._paused and not self._cancelled:
+            wait_start = time.perf_counter()
+            while self._paused and not self._cancelled:
+                self._pause_cond.wait(self._mutex)
+            waited = time.perf_counter() - wait_start
+        self._mutex.unlock()
+        return waited
+
+    def isPaused(self):
+        return self._paused
+
+    def pause(self):
+        self._mutex.lock()
+        self._paused = True
+        self._mutex.unlock()
+
+    def resume(self):
+        self._mutex.lock()
+        self._paused = False
+        self._pause_cond.wakeAll()
+        self._mutex.unlock()
+
+    def cancel(self):
+        self._mutex.lock()
+        self._cancelled = True
+        self._pause_cond.wakeAll()
+        self._mutex.unlock()
@@ -15,11 +15,11 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QFrame, QGraphicsView, QGridLayout,
-    QHBoxLayout, QHeaderView, QLabel, QLineEdit,
-    QMainWindow, QPushButton, QScrollArea, QSizePolicy,
-    QSpacerItem, QStackedWidget, QTableView, QTreeView,
-    QVBoxLayout, QWidget)
+from PySide6.QtWidgets import (QApplication, QComboBox, QFrame, QGraphicsView,
+    QGridLayout, QHBoxLayout, QHeaderView, QLabel,
+    QLineEdit, QMainWindow, QProgressBar, QPushButton,
+    QScrollArea, QSizePolicy, QSpacerItem, QStackedWidget,
+    QTableView, QTreeView, QVBoxLayout, QWidget)
 from . import resources_rc
 
 class Ui_MainWindow(object):
@@ -1074,6 +1074,22 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_8.addWidget(self.ImageFolderButton)
 
+        self.WatchFolderButton = QPushButton(self.calculate)
+        self.WatchFolderButton.setObjectName(u"WatchFolderButton")
+        self.WatchFolderButton.setEnabled(False)
+        self.WatchFolderButton.setMinimumSize(QSize(160, 40))
+        self.WatchFolderButton.setStyleSheet(u".QPushButton { background-color: rgb(52, 59, 72); border: none;  border-radius: 5px; }\n"
+".QPushButton:hover { background-color: rgb(44, 49, 57); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:checked { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+"")
+        icon7 = QIcon()
+        icon7.addFile(u":/icons/images/icons/cil-loop-circular.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.WatchFolderButton.setIcon(icon7)
+        self.WatchFolderButton.setCheckable(True)
+
+        self.horizontalLayout_8.addWidget(self.WatchFolderButton)
+
 
         self.verticalLayout.addLayout(self.horizontalLayout_8)
 
@@ -1082,6 +1098,55 @@ class Ui_MainWindow(object):
 
         self.verticalLayout.addWidget(self.ImageTableView)
 
+        self.horizontalLayout_10 = QHBoxLayout()
+        self.horizontalLayout_10.setObjectName(u"horizontalLayout_10")
+        self.InferenceProgressBar = QProgressBar(self.calculate)
+        self.InferenceProgressBar.setObjectName(u"InferenceProgressBar")
+        self.InferenceProgressBar.setMinimumSize(QSize(0, 30))
+        self.InferenceProgressBar.setValue(0)
+        self.InferenceProgressBar.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.horizontalLayout_10.addWidget(self.InferenceProgressBar)
+
+        self.InferenceEtaLabel = QLabel(self.calculate)
+        self.InferenceEtaLabel.setObjectName(u"InferenceEtaLabel")
+        self.InferenceEtaLabel.setMinimumSize(QSize(160, 0))
+
+        self.horizontalLayout_10.addWidget(self.InferenceEtaLabel)
+
+        self.PauseInferenceButton = QPushButton(self.calculate)
+        self.PauseInferenceButton.setObjectName(u"PauseInferenceButton")
+        self.PauseInferenceButton.setEnabled(False)
+        self.PauseInferenceButton.setMinimumSize(QSize(120, 30))
+        self.PauseInferenceButton.setStyleSheet(u".QPushButton { background-color: rgb(52, 59, 72); border: none;  border-radius: 5px; }\n"
+".QPushButton:hover { background-color: rgb(44, 49, 57); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:checked { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+"")
+        icon8 = QIcon()
+        icon8.addFile(u":/icons/images/icons/cil-media-pause.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.PauseInferenceButton.setIcon(icon8)
+
+        self.horizontalLayout_10.addWidget(self.PauseInferenceButton)
+
+        self.CancelInferenceButton = QPushButton(self.calculate)
+        self.CancelInferenceButton.setObjectName(u"CancelInferenceButton")
+        self.CancelInferenceButton.setEnabled(False)
+        self.CancelInferenceButton.setMinimumSize(QSize(120, 30))
+        self.CancelInferenceButton.setStyleSheet(u".QPushButton { background-color: rgb(52, 59, 72); border: none;  border-radius: 5px; }\n"
+".QPushButton:hover { background-color: rgb(44, 49, 57); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+".QPushButton:checked { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
+"")
+        icon9 = QIcon()
+        icon9.addFile(u":/icons/images/icons/cil-media-stop.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.CancelInferenceButton.setIcon(icon9)
+
+        self.horizontalLayout_10.addWidget(self.CancelInferenceButton)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout_10)
+
         self.SaveImageButton = QPushButton(self.calculate)
         self.SaveImageButton.setObjectName(u"SaveImageButton")
         self.SaveImageButton.setMinimumSize(QSize(0, 40))
@@ -1090,9 +1155,9 @@ class Ui_MainWindow(object):
 ".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
 ".QPushButton:checked { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
 "")
-        icon7 = QIcon()
-        icon7.addFile(u":/icons/images/icons/cil-save.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
-        self.SaveImageButton.setIcon(icon7)
+        icon10 = QIcon()
+        icon10.addFile(u":/icons/images/icons/cil-save.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.SaveImageButton.setIcon(icon10)
 
         self.verticalLayout.addWidget(self.SaveImageButton)
 
@@ -1191,7 +1256,7 @@ class Ui_MainWindow(object):
 
         self.frame_2 = QFrame(self.frame)
         self.frame_2.setObjectName(u"frame_2")
-        self.frame_2.setMinimumSize(QSize(0, 180))
+        self.frame_2.setMinimumSize(QSize(0, 250))
         self.frame_2.setStyleSheet(u"background: transparent;")
         self.frame_2.setFrameShape(QFrame.Shape.StyledPanel)
         self.frame_2.setFrameShadow(QFrame.Shadow.Raised)
@@ -1227,12 +1292,26 @@ class Ui_MainWindow(object):
 ".QPushButton:pressed { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
 ".QPushButton:checked { background-color: rgb(23, 26, 30); border-style: solid; border-radius: 4px; }\n"
 "")
-        icon8 = QIcon()
-        icon8.addFile(u":/icons/images/icons/cil-pencil.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
-        self.gdinoThresholdButton.setIcon(icon8)
+        icon11 = QIcon()
+        icon11.addFile(u":/icons/images/icons/cil-pencil.png", QSize(), QIcon.Mode.Normal, QIcon.State.Off)
+        self.gdinoThresholdButton.setIcon(icon11)
 
         self.verticalLayout_17.addWidget(self.gdinoThresholdButton)
 
+        self.ResolutionLabel = QLabel(self.frame_2)
+        self.ResolutionLabel.setObjectName(u"ResolutionLabel")
+
+        self.verticalLayout_17.addWidget(self.ResolutionLabel)
+
+        self.ResolutionComboBox = QComboBox(self.frame_2)
+        self.ResolutionComboBox.addItem("")
+        self.ResolutionComboBox.addItem("")
+        self.ResolutionComboBox.addItem("")
+        self.ResolutionComboBox.setObjectName(u"ResolutionComboBox")
+        self.ResolutionComboBox.setMinimumSize(QSize(0, 30))
+
+        self.verticalLayout_17.addWidget(self.ResolutionComboBox)
+
 
         self.verticalLayout_14.addWidget(self.frame_2)
 
@@ -1378,6 +1457,10 @@ class Ui_MainWindow(object):
         self.label.setText(QCoreApplication.translate("MainWindow", u"Image Folder Path", None))
         self.ImageFolderLineEdit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"Image Folder Location", None))
         self.ImageFolderButton.setText(QCoreApplication.translate("MainWindow", u"Open Folder", None))
+        self.WatchFolderButton.setText(QCoreApplication.translate("MainWindow", u"Watch Folder", None))
+        self.InferenceEtaLabel.setText(QCoreApplication.translate("MainWindow", u"ETA: -", None))
+        self.PauseInferenceButton.setText(QCoreApplication.translate("MainWindow", u"Pause", None))
+        self.CancelInferenceButton.setText(QCoreApplication.translate("MainWindow", u"Cancel", None))
         self.SaveImageButton.setText(QCoreApplication.translate("MainWindow", u"Save Images", None))
         self.label_2.setText(QCoreApplication.translate("MainWindow", u"<html><head/><body><p align=\"center\"><span style=\" font-size:12pt; font-weight:700;\">Tool Box</span></p></body></html>", None))
         self.label_3.setText(QCoreApplication.translate("MainWindow", u"<html><head/><body><p><span style=\" font-weight:700;\">AI Tool</span></p></body></html>", None))
@@ -1385,6 +1468,11 @@ class Ui_MainWindow(object):
         self.gdinoThresholdLabel.setText(QCoreApplication.translate("MainWindow", u"Current Threshold: 0.7", None))
         self.gdinoThresholdLineEdit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"Score Threshold", None))
         self.gdinoThresholdButton.setText(QCoreApplication.translate("MainWindow", u"Save Threshold", None))
+        self.ResolutionLabel.setText(QCoreApplication.translate("MainWindow", u"Input Resolution", None))
+        self.ResolutionComboBox.setItemText(0, QCoreApplication.translate("MainWindow", u"fast", None))
+        self.ResolutionComboBox.setItemText(1, QCoreApplication.translate("MainWindow", u"balanced", None))
+        self.ResolutionComboBox.setItemText(2, QCoreApplication.translate("MainWindow", u"full", None))
+
         self.label_4.setText(QCoreApplication.translate("MainWindow", u"<html><head/><body><p><span style=\" font-size:10pt; font-weight:700;\">Opening Inspection Tool</span></p></body></html>", None))
         self.label_5.setText(QCoreApplication.translate("MainWindow", u"Current Status: ", None))
         self.OpeningStatusLineEdit.setText("")
@@ -0,0 +1,4 @@
+# Qt-free inference package (used by the GUI and the pguard command line)
+from .config import PipelineConfig
+from .pipeline import Pipeline, list_images
+from .loader import load_pipeline_async
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+
+import torch
+
+# Set in the parent right before fork, inherited by the workers
+_WORKER_INFER_FN = None
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def _run_shard(args):
+    image_paths, images, kwargs = args
+    return _WORKER_INFER_FN(image_paths, images=images, **kwargs)
+
+
+def fork_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+class InferencePool():
+    """CPU process pool sharing model weights with the parent
+
+    Model tensors are moved to shared memory and the workers are forked, so
+    N workers read the same weight pages instead of holding N copies.
+    infer_fn: (list of image path, images=None, **kwargs) -> list of result dict
+    kwargs are sent with every call, since workers only see parent state as of fork
+    """
+
+    def __init__(self, num_workers, infer_fn, models):
+        global _WORKER_INFER_FN
+
+        for model in models:
+            model.share_memory()
+
+        self.num_workers = num_workers
+        num_threads = max((os.cpu_count() or num_workers) // num_workers, 1)
+
+        _WORKER_INFER_FN = infer_fn
+        self.pool = multiprocessing.get_context("fork").Pool(
+            num_workers, initializer=_init_worker, initargs=(num_threads,)
+        )
+
+    def map(self, image_paths, images=None, **kwargs):
+        # images: decoded images of image_paths (sent to the workers), None: workers load image_paths
+        if len(image_paths) == 0:
+            return []
+
+        # Contiguous shards keep the merged result in image_paths order
+        shard_size = -(-len(image_paths) // self.num_workers)
+        shards = []
+        for start in range(0, len(image_paths), shard_size):
+            shard_images = images[start:start + shard_size] if images is not None else None
+            shards.append((image_paths[start:start + shard_size], shard_images, kwargs))
+
+        results = []
+        for shard_results in self.pool.map(_run_shard, shards):
+            results += shard_results
+        return results
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
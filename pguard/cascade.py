@@ -0,0 +1,64 @@
+import numpy as np
+from mmengine.config import Config
+from mmpretrain import ImageClassificationInferencer
+
+
+def load_classifier_config(config_path, input_size=None):
+    """mmpretrain config, optionally with a smaller test resize/crop (low resolution gate)"""
+    cfg = Config.fromfile(config_path)
+    if input_size is None:
+        return cfg
+
+    for pipeline in (cfg.test_pipeline, cfg.test_dataloader.dataset.pipeline):
+        for transform in pipeline:
+            if transform["type"] == "ResizeEdge":
+                transform["scale"] = int(round(input_size * 256 / 224))
+            elif transform["type"] == "CenterCrop":
+                transform["crop_size"] = input_size
+    return cfg
+
+
+class PresenceGate():
+    """Cheap image-level classifier run before Grounding DINO
+
+    score = sum of the softmax scores of positive_classes. Frames below the
+    cascade threshold skip the detector and are reported as no opening.
+    """
+
+    def __init__(self, config_path, checkpoint_path, device, positive_classes, input_size=None):
+        self.inferencer = ImageClassificationInferencer(
+            model=load_classifier_config(config_path, input_size),
+            pretrained=checkpoint_path,
+            device=device
+        )
+        self.model = self.inferencer.model
+
+        classes = list(self.inferencer.classes)
+        self.positive_idxs = [classes.index(class_name) for class_name in positive_classes]
+
+    def scores(self, images, batch_size=32):
+        if len(images) == 0:
+            return []
+
+        gate_results = self.inferencer(images, batch_size=batch_size)
+        return [float(np.sum(gate_result['pred_scores'][self.positive_idxs])) for gate_result in gate_results]
+
+
+def calibrate_threshold(gate_scores, detector_positives, target_recall=0.99):
+    """Highest gate threshold that still passes target_recall of the detector positives
+
+    -> (threshold, recall, skip ratio)
+    """
+    gate_scores = np.asarray(gate_scores, dtype=np.float64)
+    detector_positives = np.asarray(detector_positives, dtype=bool)
+    if detector_positives.sum() == 0:
+        return 0.0, 1.0, 0.0
+
+    positive_scores = np.sort(gate_scores[detector_positives])
+    # Keep the top target_recall of positive scores above the threshold
+    num_missed = int(np.floor(len(positive_scores) * (1.0 - target_recall)))
+    threshold = float(positive_scores[num_missed])
+
+    recall = float(np.mean(gate_scores[detector_positives] >= threshold))
+    skip_ratio = float(np.mean(gate_scores < threshold))
+    return threshold, recall, skip_ratio
@@ -0,0 +1,553 @@
+import argparse
+import os
+import sys
+import time
+
+from .config import PipelineConfig, RESOLUTION_PROFILES
+from .inference_config import compile_inference_config
+from .model_server import ModelServer, model_server_available
+from .pipeline import (Pipeline, CLASSIFICATION_MAP, count_frames, format_stage_counts, list_images, list_inputs,
+                       read_labels, save_result_image, write_results_csv, write_results_json)
+from .precision import compare_results
+from .prompt_cache import PromptNotCachedError
+from .watch import FolderWatcher, watch_index_path
+
+
+def add_pipeline_arguments(parser):
+    parser.add_argument("--device", help="e.g. cpu, cuda:0 (default: cuda:0 if available)")
+    parser.add_argument("--prompt", help="Grounding DINO text prompt (default: manhole)")
+    parser.add_argument("--score-thr", type=float, help="Grounding DINO score threshold (default: 0.7)")
+    parser.add_argument("--resolution", choices=list(RESOLUTION_PROFILES),
+                        help="Grounding DINO input resolution profile (default: full)")
+    parser.add_argument("--resnet-mode", choices=["frame", "crop"], help="classify whole frames or each detected box")
+    parser.add_argument("--crop-margin", type=float, help="crop mode: margin around each box (ratio, default: 0.2)")
+    parser.add_argument("--crop-max-boxes", type=int, help="crop mode: detector boxes per frame (default: 10)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="skip near-duplicate frames (perceptual hash), they inherit the representative's result")
+    parser.add_argument("--dedup-distance", type=int, help="max dHash bit difference of near duplicates (default: 4)")
+    parser.add_argument("--dedup-window", type=int,
+                        help="compare with representatives of the last N frames, 0: whole folder (default: 10)")
+    parser.add_argument("--video-interval", type=float,
+                        help="seconds between sampled frames of input videos (default: 1.0)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="detect on overlapping tiles of high resolution frames (boxes merged across tiles)")
+    parser.add_argument("--tile-size", type=int, help="tile side in frame pixels (default: 1024)")
+    parser.add_argument("--tile-overlap", type=int, help="overlap of neighbouring tiles in pixels (default: 256)")
+    parser.add_argument("--tile-batch-size", type=int, help="tiles per Grounding DINO forward pass (default: 8)")
+    parser.add_argument("--num-queries", type=int, help="Grounding DINO two-stage queries (default: 900)")
+    parser.add_argument("--decoder-layers", type=int, help="read out this decoder layer (default: 6, the last)")
+    parser.add_argument("--gdino-batch-size", type=int, help="images per Grounding DINO forward pass")
+    parser.add_argument("--resnet-batch-size", type=int, help="images per ResNet forward pass")
+    parser.add_argument("--chunk-size", type=int, help="images per pipeline step")
+    parser.add_argument("--workers", type=int, help="forked CPU worker processes")
+    parser.add_argument("--frozen-prompts", nargs="+", help="precompute these prompts and unload BERT")
+    parser.add_argument("--lazy-reload", action="store_true", help="reload BERT for prompts not in --frozen-prompts")
+    parser.add_argument("--no-result-cache", action="store_true", help="always run the models, ignore cached results")
+    parser.add_argument("--no-inference-config", action="store_true",
+                        help="build the models from the training configs as they are")
+    parser.add_argument("--no-model-server", action="store_true",
+                        help="load the models in this process even if `pguard serve` is running")
+    parser.add_argument("--backend", choices=["pytorch", "onnxruntime"],
+                        help="onnxruntime: graphs made by `pguard export-onnx` on CPU (default: pytorch)")
+    parser.add_argument("--onnx-threads", type=int, nargs=2, metavar=("INTRA", "INTER"),
+                        help="onnxruntime intra-op / inter-op threads (0: onnxruntime default)")
+    parser.add_argument("--precision", choices=["fp32", "bf16", "fp16"], help="inference precision (default: fp32)")
+    parser.add_argument("--precision-gdino-modules", nargs="*",
+                        help="Grounding DINO submodules run in --precision (default: backbone neck encoder decoder)")
+    parser.add_argument("--precision-resnet-modules", nargs="*",
+                        help="ResNet submodules run in --precision (default: backbone neck)")
+    parser.add_argument("--compile", choices=["none", "torch_compile", "torchscript"],
+                        help="compiled backbones, warmed up at load and cached on disk (default: none)")
+    parser.add_argument("--bert-int8", action="store_true", help="INT8 Grounding DINO text branch (CPU)")
+    parser.add_argument("--resnet-int8", action="store_true", help="INT8 ResNet backbone (CPU, see `pguard quantize`)")
+    parser.add_argument("--label-decision", action="store_true",
+                        help="prompt the detector classes and run ResNet only on ambiguous detections")
+    parser.add_argument("--label-margin", type=float,
+                        help="detector score that decides a box without ResNet, for every class (default: 0.85)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="run the presence classifier first and skip Grounding DINO on negatives")
+    parser.add_argument("--cascade-thr", type=float, help="presence score below this skips the detector (default: 0.05)")
+
+
+def build_config(args):
+    config = PipelineConfig()
+    overrides = {
+        "device": args.device,
+        "text_prompt": args.prompt,
+        "resolution_profile": args.resolution,
+        "video_sample_interval": args.video_interval,
+        "dedup_max_distance": args.dedup_distance,
+        "dedup_window": args.dedup_window,
+        "tile_size": args.tile_size,
+        "tile_overlap": args.tile_overlap,
+        "tile_batch_size": args.tile_batch_size,
+        "gdino_num_queries": args.num_queries,
+        "gdino_decoder_layers": args.decoder_layers,
+        "score_thr": args.score_thr,
+        "resnet_mode": args.resnet_mode,
+        "crop_margin": args.crop_margin,
+        "crop_max_boxes": args.crop_max_boxes,
+        "gdino_batch_size": args.gdino_batch_size,
+        "resnet_batch_size": args.resnet_batch_size,
+        "inference_chunk_size": args.chunk_size,
+        "cpu_workers": args.workers,
+        "frozen_prompts": args.frozen_prompts,
+        "cascade_threshold": args.cascade_thr,
+        "backend": args.backend,
+        "compile_mode": args.compile,
+        "precision": args.precision,
+        "precision_gdino_modules": args.precision_gdino_modules,
+        "precision_resnet_modules": args.precision_resnet_modules,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(config, key, value)
+    config.frozen_prompt_lazy_reload = args.lazy_reload
+    config.result_cache = not args.no_result_cache
+    config.inference_config = not args.no_inference_config
+    config.model_server = not args.no_model_server
+    config.cascade = args.cascade
+    config.label_decision = args.label_decision
+    config.tiled = args.tiled
+    config.dedup = args.dedup
+    config.bert_int8 = args.bert_int8
+    if args.onnx_threads is not None:
+        config.onnx_intra_op_threads, config.onnx_inter_op_threads = args.onnx_threads
+    config.resnet_int8 = args.resnet_int8
+    if args.label_margin is not None:
+        config.detector_label_margins = {class_name: args.label_margin for class_name in config.detector_label_codes}
+    try:
+        config.checkTiling()
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+    return config
+
+
+def run_command(args):
+    image_paths = list_inputs(args.folder)
+    os.makedirs(args.output, exist_ok=True)
+    image_folder = os.path.join(args.output, "images")
+    if args.save_images != "none":
+        os.makedirs(image_folder, exist_ok=True)
+
+    pipeline = Pipeline(build_config(args))
+    try:
+        pipeline.checkPrompt()
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        pipeline.close()
+        return 1
+
+    # CSV rows are appended as results arrive, so a failing image keeps the rows before it
+    csv_path = os.path.join(args.output, "results.csv")
+    if args.format in ("csv", "both"):
+        write_results_csv([], csv_path) # header
+
+    results = []
+    status = 0
+    frame_count = count_frames(image_paths, pipeline.config.video_sample_interval)
+    start_time = time.perf_counter()
+    try:
+        for idx, result in enumerate(pipeline.run(image_paths), 1):
+            results.append(result)
+            print(f"[{idx}/{frame_count}] {result['image']}: {CLASSIFICATION_MAP[result['resnet']]} "
+                  f"({result['decided_by']})")
+
+            if args.format in ("csv", "both"):
+                write_results_csv([result], csv_path, append=True)
+            if args.save_images == "all" or (args.save_images == "abnormal" and result["resnet"] == 2):
+                save_result_image(result, image_folder)
+    except Exception as e:
+        print(f"Run stopped after {len(results)} images: {e!r}", file=sys.stderr)
+        status = 1
+    finally:
+        pipeline.close()
+        if args.format in ("json", "both"):
+            write_results_json(results, os.path.join(args.output, "results.json"))
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Calculation Complete: {len(results)} images in {elapsed:.1f}s")
+    print(format_stage_counts(pipeline.stage_counts))
+    if pipeline.config.dedup:
+        print(f"Near-duplicate frames: {pipeline.stage_counts['duplicates']} inferences saved")
+    return status
+
+
+def watch_command(args):
+    os.makedirs(args.output, exist_ok=True)
+    image_folder = os.path.join(args.output, "images")
+    if args.save_images != "none":
+        os.makedirs(image_folder, exist_ok=True)
+
+    config = build_config(args)
+    if args.settle is not None:
+        config.watch_settle_seconds = args.settle
+    watcher = FolderWatcher(args.folder, watch_index_path(config.dnn_cache_folder, args.folder),
+                            settle_seconds=config.watch_settle_seconds)
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        pipeline.close()
+        return 1
+
+    print(f"Watching {args.folder} (Ctrl+C to stop)")
+    try:
+        while True:
+            image_paths = watcher.poll()
+            if len(image_paths) == 0:
+                time.sleep(min(args.interval, config.watch_settle_seconds) if watcher.hasPending() else args.interval)
+                continue
+
+            results = []
+            for result in pipeline.run(image_paths):
+                results.append(result)
+                print(f"{result['image']}: {CLASSIFICATION_MAP[result['resnet']]} ({result['decided_by']})")
+
+                if args.save_images == "all" or (args.save_images == "abnormal" and result["resnet"] == 2):
+                    save_result_image(result, image_folder)
+
+            write_results_csv(results, os.path.join(args.output, "results.csv"), append=True)
+            watcher.markProcessed(image_paths)
+            print(format_stage_counts(pipeline.stage_counts))
+    except KeyboardInterrupt:
+        print("Stop watching")
+    finally:
+        pipeline.close()
+    return 0
+
+
+def calibrate_cascade_command(args):
+    config = build_config(args)
+    config.model_server = False # needs the models in process
+    config.cascade = True
+    config.result_cache = False
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        threshold, recall, skip_ratio = pipeline.calibrateCascade(list_images(args.folder), args.target_recall)
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+
+    print(f"cascade threshold: {threshold:.4f} (recall {recall:.4f}, detector skipped on {skip_ratio:.1%} of frames)")
+    print(f"use it with --cascade --cascade-thr {threshold:.4f}")
+    return 0
+
+
+def validate_precision_command(args):
+    config = build_config(args)
+    config.model_server = False # needs the models in process
+    config.backend = "pytorch"
+    config.compile_mode = "none" # precision is switched in place
+    config.result_cache = False
+    config.cpu_workers = 1 # models are switched between fp32 and args.precision in process
+    gdino_modules = list(config.precision_gdino_modules)
+    resnet_modules = list(config.precision_resnet_modules)
+
+    module_sets = [(gdino_modules, resnet_modules)]
+    if args.per_module:
+        module_sets += [([module_name], []) for module_name in gdino_modules]
+        module_sets += [([], [module_name]) for module_name in resnet_modules]
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        fp32_seconds, reports = pipeline.validatePrecision(list_images(args.folder), args.precision, module_sets)
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+
+    print(f"fp32: {fp32_seconds:.1f}s")
+    for gdino_modules, resnet_modules, report, seconds in reports:
+        print(f"{args.precision} gdino=[{' '.join(gdino_modules)}] resnet=[{' '.join(resnet_modules)}]: "
+              f"{seconds:.1f}s (x{fp32_seconds / max(seconds, 1e-6):.2f}), "
+              f"decision agreement {report['decision_agreement']:.2%}, "
+              f"box count mismatches {report['box_count_mismatches']}/{report['images']}, "
+              f"mean IoU {report['mean_iou']:.4f}, max score diff {report['max_score_diff']:.4f}")
+        for image in report["decision_changed"]:
+            print(f"  decision changed: {image}")
+    return 0
+
+
+def quantize_command(args):
+    config = build_config(args)
+    config.model_server = False # needs the models in process
+    config.backend = "pytorch"
+    config.compile_mode = "none"
+    config.device = 'cpu'
+    config.result_cache = False
+    config.cpu_workers = 1
+    config.frozen_prompts = [] # quantization needs the BERT weights
+    config.bert_int8 = config.resnet_int8 = False
+
+    calibration_paths = list_images(args.folder)[:args.calibration_images]
+    eval_paths = list_images(args.eval_folder) if args.eval_folder is not None else calibration_paths
+
+    # 1. fp32 -> INT8 models (next to the checkpoints)
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        pipeline.saveInt8Models(calibration_paths)
+        print(f"Saved {config.bert_int8_path}")
+        print(f"Saved {config.resnet_int8_path}")
+        fp32_results, fp32_seconds = pipeline.benchmark(eval_paths)
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+
+    # 2. INT8 Latency / Accuracy Delta
+    config.bert_int8 = config.resnet_int8 = True
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        int8_results, int8_seconds = pipeline.benchmark(eval_paths)
+    finally:
+        pipeline.close()
+
+    for key in ["text_branch", "resnet", "pipeline"]:
+        print(f"{key}: fp32 {fp32_seconds[key]:.3f}s, int8 {int8_seconds[key]:.3f}s "
+              f"(x{fp32_seconds[key] / max(int8_seconds[key], 1e-6):.2f})")
+
+    report = compare_results(fp32_results, int8_results)
+    print(f"{len(eval_paths)} images: decision agreement {report['decision_agreement']:.2%}, "
+          f"box count mismatches {report['box_count_mismatches']}, "
+          f"mean IoU {report['mean_iou']:.4f}, max score diff {report['max_score_diff']:.4f}")
+    for image in report["decision_changed"]:
+        print(f"  decision changed: {image}")
+    return 0
+
+
+def export_onnx_command(args):
+    config = build_config(args)
+    config.model_server = False # needs the models in process
+    config.backend = "pytorch"
+    config.compile_mode = "none"
+    config.gdino_num_queries = config.gdino_decoder_layers = None # graphs are looked up by prompt and shape only
+    config.device = 'cpu'
+    config.result_cache = False
+    config.cpu_workers = 1
+    config.precision = "fp32"
+    config.bert_int8 = config.resnet_int8 = False
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        onnx_paths = pipeline.exportOnnx(list_images(args.folder))
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+
+    for onnx_path in onnx_paths:
+        print(f"Saved {onnx_path}")
+    print(f"Text prompt: {pipeline.detectorPrompt()[0]} (run with --backend onnxruntime)")
+    return 0
+
+
+def bench_command(args):
+    config = build_config(args)
+    config.model_server = False # needs the models in process
+    config.result_cache = False
+    config.backend = "pytorch"
+    image_paths = list_images(args.folder)
+    labels = read_labels(args.labels) if args.labels is not None else None
+
+    # Reference (full resolution, full decoder) first, every combination is compared against it
+    combinations = [("full", None, None)] + [
+        (profile, num_queries, num_decoder_layers)
+        for profile in args.profiles for num_queries in args.queries for num_decoder_layers in args.layers
+        if (profile, num_queries, num_decoder_layers) != ("full", None, None)
+    ]
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        reference_results = None
+        for profile, num_queries, num_decoder_layers in combinations:
+            config.resolution_profile = profile
+            pipeline.setDecoderCapacity(num_queries, num_decoder_layers)
+            pipeline.timeInference(image_paths[:args.warmup]) # compile / first call overhead
+            results, seconds = pipeline.timeInference(image_paths)
+            if reference_results is None:
+                reference_results = results
+
+            report = compare_results(reference_results, results)
+            line = (f"{profile} {RESOLUTION_PROFILES[profile][0]}x{RESOLUTION_PROFILES[profile][1]}, "
+                    f"queries {num_queries or 'all'}, decoder layers {num_decoder_layers or 'all'}: "
+                    f"{seconds / max(len(results), 1) * 1000:.0f} ms/image, "
+                    f"vs reference: box recall {report['box_recall']:.2%}, "
+                    f"decision agreement {report['decision_agreement']:.2%}, "
+                    f"box count mismatches {report['box_count_mismatches']}/{report['images']}, "
+                    f"mean IoU {report['mean_iou']:.4f}")
+            if labels is not None:
+                labeled = [result for result in results if result["image"] in labels]
+                correct = sum(result["resnet"] == labels[result["image"]] for result in labeled)
+                line += f", label accuracy {correct / max(len(labeled), 1):.2%} ({len(labeled)} labeled)"
+            print(line)
+    except PromptNotCachedError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+    return 0
+
+
+def serve_command(args):
+    if not model_server_available():
+        print("Unix domain sockets are not available on this platform.", file=sys.stderr)
+        return 1
+
+    config = build_config(args)
+    config.model_server = False
+    config.result_cache = False # clients keep their own result caches
+    if args.socket is not None:
+        config.model_server_socket = args.socket
+    if args.batch_window is not None:
+        config.model_server_batch_window = args.batch_window
+
+    pipeline = Pipeline(config)
+    try:
+        pipeline.checkPrompt()
+        server = ModelServer(pipeline, config.model_server_socket, batch_window=config.model_server_batch_window)
+        print(f"Serving models on {config.model_server_socket} (Ctrl+C to stop)")
+        server.serveForever()
+    except (PromptNotCachedError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.close()
+    return 0
+
+
+def compile_config_command(args):
+    from mmengine.config import Config
+
+    config = PipelineConfig()
+    config_paths = args.configs or [config.gdino_config_path, config.resnet_config_path]
+    for config_path in config_paths:
+        compiled_path = compile_inference_config(config_path, config.dnn_cache_folder)
+        removed_keys = sorted(set(Config.fromfile(config_path).keys()) - set(Config.fromfile(compiled_path).keys()))
+        print(f"{config_path} -> {compiled_path}")
+        print(f"  removed: {', '.join(removed_keys)}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pguard", description="P-Guard: Prompt based automated opening Guard System")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # pguard run
+    run_parser = subparsers.add_parser("run", help="run detection and classification on an image folder")
+    run_parser.add_argument("folder", help="image / video folder (.jpg, .png, .mp4, .avi, .mov, .mkv)")
+    run_parser.add_argument("-o", "--output", default="pguard_output", help="output folder")
+    run_parser.add_argument("--format", choices=["csv", "json", "both"], default="csv")
+    run_parser.add_argument("--save-images", choices=["abnormal", "all", "none"], default="abnormal",
+                            help="which annotated images to write to <output>/images")
+    add_pipeline_arguments(run_parser)
+    run_parser.set_defaults(func=run_command)
+
+    # pguard watch
+    watch_parser = subparsers.add_parser("watch", help="process images as they arrive in a folder")
+    watch_parser.add_argument("folder", help="image folder (.jpg, .png)")
+    watch_parser.add_argument("-o", "--output", default="pguard_output", help="output folder (results.csv is appended)")
+    watch_parser.add_argument("--save-images", choices=["abnormal", "all", "none"], default="abnormal",
+                              help="which annotated images to write to <output>/images")
+    watch_parser.add_argument("--interval", type=float, default=5.0, help="seconds between folder scans")
+    watch_parser.add_argument("--settle", type=float,
+                              help="seconds a file must stay unchanged before it is processed (default: 2)")
+    add_pipeline_arguments(watch_parser)
+    watch_parser.set_defaults(func=watch_command)
+
+    # pguard calibrate-cascade
+    calibrate_parser = subparsers.add_parser(
+        "calibrate-cascade", help="pick the presence classifier threshold on a reference image folder"
+    )
+    calibrate_parser.add_argument("folder", help="reference image folder (.jpg, .png)")
+    calibrate_parser.add_argument("--target-recall", type=float, default=0.99,
+                                  help="fraction of detector positives the cascade must keep (default: 0.99)")
+    add_pipeline_arguments(calibrate_parser)
+    calibrate_parser.set_defaults(func=calibrate_cascade_command)
+
+    # pguard validate-precision
+    validate_parser = subparsers.add_parser(
+        "validate-precision", help="compare bf16/fp16 boxes, scores and decisions against fp32 on a reference folder"
+    )
+    validate_parser.add_argument("folder", help="reference image folder (.jpg, .png)")
+    validate_parser.add_argument("--per-module", action="store_true",
+                                 help="also test each submodule alone, to find where precision hurts")
+    add_pipeline_arguments(validate_parser)
+    validate_parser.set_defaults(func=validate_precision_command, precision="bf16")
+
+    # pguard quantize
+    quantize_parser = subparsers.add_parser(
+        "quantize", help="build INT8 BERT / ResNet models for CPU and report latency and accuracy against fp32"
+    )
+    quantize_parser.add_argument("folder", help="calibration image folder (.jpg, .png)")
+    quantize_parser.add_argument("--calibration-images", type=int, default=200,
+                                 help="number of calibration images (default: 200)")
+    quantize_parser.add_argument("--eval-folder", help="image folder for the report (default: calibration images)")
+    add_pipeline_arguments(quantize_parser)
+    quantize_parser.set_defaults(func=quantize_command)
+
+    # pguard bench
+    bench_parser = subparsers.add_parser(
+        "bench", help="latency and recall of resolution profiles x query counts x decoder layers on an image folder"
+    )
+    bench_parser.add_argument("folder", help="image folder (.jpg, .png)")
+    bench_parser.add_argument("--labels",
+                              help="CSV with image and label (resnet code 0/1/2) columns, e.g. a reviewed results.csv")
+    bench_parser.add_argument("--profiles", nargs="+", choices=list(RESOLUTION_PROFILES),
+                              default=list(RESOLUTION_PROFILES), help="profiles to compare (default: all)")
+    bench_parser.add_argument("--queries", nargs="+", type=int, default=[None],
+                              help="query counts to compare, e.g. 900 300 100 (default: config value)")
+    bench_parser.add_argument("--layers", nargs="+", type=int, default=[None],
+                              help="decoder layers to compare, e.g. 6 4 3 (default: all)")
+    bench_parser.add_argument("--warmup", type=int, default=1, help="untimed images per profile (default: 1)")
+    add_pipeline_arguments(bench_parser)
+    bench_parser.set_defaults(func=bench_command)
+
+    # pguard export-onnx
+    export_parser = subparsers.add_parser(
+        "export-onnx", help="export ResNet and Grounding DINO (current prompt) to ONNX for --backend onnxruntime"
+    )
+    export_parser.add_argument("folder", help="sample image folder, one detector graph per image size found")
+    add_pipeline_arguments(export_parser)
+    export_parser.set_defaults(func=export_onnx_command)
+
+    # pguard serve
+    serve_parser = subparsers.add_parser(
+        "serve", help="keep the models loaded and serve GUI / CLI sessions over a Unix domain socket"
+    )
+    serve_parser.add_argument("--socket", help="socket path (default: init/dnn/cache/model_server.sock)")
+    serve_parser.add_argument("--batch-window", type=float,
+                              help="seconds to wait for other clients' images before a batch (default: 0.05)")
+    add_pipeline_arguments(serve_parser)
+    serve_parser.set_defaults(func=serve_command)
+
+    # pguard compile-config
+    compile_config_parser = subparsers.add_parser(
+        "compile-config", help="build the inference-only model configs (done automatically at model load)"
+    )
+    compile_config_parser.add_argument("configs", nargs="*",
+                                       help="training config files (default: Grounding DINO and ResNet configs)")
+    compile_config_parser.set_defaults(func=compile_config_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
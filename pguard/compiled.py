@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+
+import torch
+from torch import nn
+
+COMPILE_MODES = ["none", "torch_compile", "torchscript"]
+
+
+class _ForwardModule(nn.Module):
+    # torch.jit.trace needs a module, forward is the eager (possibly autocast wrapped) forward
+    def __init__(self, module, forward):
+        super().__init__()
+        self.module = module
+        self._forward = forward
+
+    def forward(self, inputs):
+        return self._forward(inputs)
+
+
+class CompiledForward():
+    """Replaces module.forward of a single tensor input module (e.g. a backbone)
+
+    torch_compile: torch.compile, Inductor artifacts cached on disk (see enable_compile_cache).
+    torchscript: one torch.jit.trace per input shape, saved as {cache_dir}/{key}_{shape}.pt.
+    Input shapes seen so far are kept in {cache_dir}/{key}_shapes.json and warmed up at load.
+    """
+
+    def __init__(self, module, mode, cache_dir, key):
+        self.module = module
+        self.mode = mode
+        self.cache_dir = cache_dir
+        self.key = key
+        self.eager_forward = module.forward
+        self.device = next(module.parameters()).device
+
+        self.shapes_path = os.path.join(cache_dir, f"{key}_shapes.json")
+        self.shapes = []
+        if os.path.exists(self.shapes_path):
+            with open(self.shapes_path, "r", encoding="utf-8") as f:
+                self.shapes = [tuple(shape) for shape in json.load(f)]
+
+        self.compiled = torch.compile(self.eager_forward) if mode == "torch_compile" else None
+        self.traced = {}
+
+    def __call__(self, inputs):
+        shape = tuple(inputs.shape)
+        if shape not in self.shapes:
+            self.shapes.append(shape)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.shapes_path, "w", encoding="utf-8") as f:
+                json.dump(self.shapes, f)
+
+        if self.mode == "torch_compile":
+            return self.compiled(inputs)
+
+        if shape not in self.traced:
+            self.traced[shape] = self.loadOrTrace(inputs)
+        return self.traced[shape](inputs)
+
+    def loadOrTrace(self, inputs):
+        trace_path = os.path.join(self.cache_dir, f"{self.key}_{'x'.join(map(str, inputs.shape))}.pt")
+        if os.path.exists(trace_path):
+            return torch.jit.load(trace_path, map_location=self.device)
+
+        with torch.no_grad():
+            traced = torch.jit.trace(_ForwardModule(self.module, self.eager_forward).eval(), (inputs,),
+                                     check_trace=False)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        torch.jit.save(traced, trace_path)
+        return traced
+
+    def warmup(self):
+        # Compile / load the traces of the input shapes seen in earlier runs
+        with torch.no_grad():
+            for shape in list(self.shapes):
+                self(torch.zeros(shape, device=self.device))
+
+
+def enable_compile_cache(cache_dir):
+    # Inductor FX graph / kernel cache on disk, later launches skip most of the compilation
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+    os.environ.setdefault("TRITON_CACHE_DIR", os.path.join(cache_dir, "triton"))
+    import torch._inductor.config as inductor_config
+    inductor_config.fx_graph_cache = True
+
+
+def apply_compile(model, module_names, mode, cache_dir, key):
+    """Compile the named submodules of model in place -> list of CompiledForward
+
+    key identifies the weights and settings (checkpoint hash, precision ...) of the traces on disk.
+    """
+    if mode == "none":
+        return []
+
+    compiled_forwards = []
+    for module_name in module_names:
+        module = model.get_submodule(module_name)
+        if isinstance(module, torch.jit.ScriptModule):
+            continue
+        module_key = hashlib.sha1(f"{key}\0{module_name}\0{torch.__version__}".encode("utf-8")).hexdigest()[:16]
+        compiled_forward = CompiledForward(module, mode, cache_dir, f"{module_name}_{module_key}")
+        module.forward = compiled_forward
+        compiled_forwards.append(compiled_forward)
+    return compiled_forwards
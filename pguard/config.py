@@ -0,0 +1,115 @@
+import os
+
+import torch
+
+# Repository root (init/ folder location)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Grounding DINO test Resize scale (long edge, short edge), "full" = config value
+RESOLUTION_PROFILES = {"fast": (800, 480), "balanced": (1066, 640), "full": (1333, 800)}
+
+
+class PipelineConfig():
+    def __init__(self, home=None):
+        self.home = home if home is not None else ROOT
+
+        # Model Files
+        self.gdino_config_path = os.path.join(self.home, "init", "dnn", "config", "grounding_dino.py")
+        self.gdino_checkpoint_path = os.path.join(self.home, "init", "dnn", "checkpoint", "grounding_dino.pth")
+        self.resnet_config_path = os.path.join(self.home, "init", "dnn", "config", "resnet.py")
+        self.resnet_checkpoint_path = os.path.join(self.home, "init", "dnn", "checkpoint", "resnet.pth")
+        self.bert_int8_path = os.path.join(self.home, "init", "dnn", "checkpoint", "grounding_dino_bert_int8.pth")
+        self.resnet_int8_path = os.path.join(self.home, "init", "dnn", "checkpoint", "resnet_int8.pt")
+        self.onnx_folder = os.path.join(self.home, "init", "dnn", "onnx") # `pguard export-onnx` output
+        self.cascade_config_path = os.path.join(self.home, "init", "dnn", "config", "presence.py")
+        self.cascade_checkpoint_path = os.path.join(self.home, "init", "dnn", "checkpoint", "presence.pth")
+        self.dnn_cache_folder = os.path.join(self.home, "init", "dnn", "cache")
+        self.inference_config = True # build models from stripped configs (`pguard compile-config`), cached in dnn_cache_folder
+
+        # Inference
+        self.device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
+        self.score_thr = 0.7
+        self.text_prompt = "manhole"
+        self.resolution_profile = "full" # RESOLUTION_PROFILES key
+        self.gdino_num_queries = None # e.g. 100: fewer two-stage queries (None: config num_queries=900)
+        self.gdino_decoder_layers = None # e.g. 4: read out an intermediate decoder layer (None: all 6)
+
+        # Tiled Inference (high resolution frames: overlapping tiles instead of one squashed frame)
+        self.tiled = False
+        self.tile_size = 1024 # tile side in frame pixels, each tile is resized by the test pipeline
+        self.tile_overlap = 256 # should exceed the object size, boxes cut by a tile border are dropped
+        self.tile_batch_size = 8 # tiles per Grounding DINO forward pass (bounds peak memory)
+        self.tile_full_frame = True # also detect on the whole resized frame (objects larger than the overlap)
+
+        # Text Prompt
+        self.frozen_prompts = [] # e.g. ["manhole"]: precompute these prompts and unload BERT
+        self.frozen_prompt_lazy_reload = False # reload BERT for other prompts instead of failing
+
+        # Classification
+        self.resnet_mode = "frame" # "frame": classify the whole image, "crop": classify each detected box
+        self.crop_margin = 0.2 # crop mode: margin around each box (ratio of box width/height)
+        self.crop_max_boxes = 10 # crop mode: detector boxes per frame (the detector config keeps 1)
+
+        # Backend ("pytorch", "onnxruntime": exported graphs on the CPU execution provider)
+        self.backend = "pytorch"
+        self.onnx_intra_op_threads = 0 # 0: onnxruntime default (physical cores)
+        self.onnx_inter_op_threads = 0 # >1: run independent graph nodes in parallel
+
+        # Precision ("fp32", "bf16": CPU AVX512-BF16/AMX or recent GPUs, "fp16": GPU)
+        # Only these submodules run in reduced precision, the rest (BERT text branch, heads) stays fp32
+        self.precision = "fp32"
+        self.precision_gdino_modules = ["backbone", "neck", "encoder", "decoder"]
+        self.precision_resnet_modules = ["backbone", "neck"]
+
+        # Compiled Mode ("none", "torch_compile", "torchscript": traced per input shape)
+        # Artifacts are cached in dnn_cache_folder, input shapes of earlier runs are warmed up at load
+        self.compile_mode = "none"
+        self.compile_gdino_modules = ["backbone"] # single tensor input submodules
+        self.compile_resnet_modules = ["backbone"]
+
+        # INT8 (CPU only, models made by `pguard quantize`)
+        self.bert_int8 = False # dynamic INT8 Grounding DINO text branch
+        self.resnet_int8 = False # static INT8 ResNet backbone (calibrated)
+
+        # Detector Label Decision (ResNet only for ambiguous detections)
+        self.label_decision = False # prompt the detector classes and trust confident labels
+        self.detector_label_codes = {"open manhole": 2, "closed manhole": 1} # detector classes (label order) -> resnet code
+        self.detector_label_margins = {"open manhole": 0.85, "closed manhole": 0.85} # score needed to skip ResNet
+
+        # Cascade (cheap presence classifier before Grounding DINO)
+        self.cascade = False # requires a presence classifier at cascade_config_path / cascade_checkpoint_path
+        self.cascade_threshold = 0.05 # presence score below this skips the detector (tune with `pguard calibrate-cascade`)
+        self.cascade_positive_classes = ["manhole"] # presence classifier classes that mean "opening visible"
+        self.cascade_input_size = 112 # low resolution crop size of the presence classifier (None: config default)
+        self.cascade_batch_size = 64
+
+        # Batching
+        self.gdino_batch_size = 4 # Grounding DINO images per forward pass
+        self.resnet_batch_size = 32 # ResNet images per forward pass (config batch_size)
+        self.inference_chunk_size = 32 # images per pipeline step (detection -> classification)
+        self.cpu_workers = 1 # >1: shard each chunk across forked CPU processes sharing the model weights
+
+        # Caching
+        self.result_cache = True # reuse results of unchanged images (keyed by content hash)
+
+        # Model Server (`pguard serve`: one process owns the models, GUI / CLI sessions send image paths)
+        self.model_server = True # use a running server, load the models in process if there is none
+        self.model_server_socket = os.path.join(self.dnn_cache_folder, "model_server.sock")
+        self.model_server_batch_window = 0.05 # seconds the server waits to batch requests of several clients
+
+        # Near-Duplicate Frames (perceptual hash, results inherited from a representative frame)
+        self.dedup = False # frames that differ only in the cover state can look alike, check the threshold first
+        self.dedup_max_distance = 4 # dHash bits (of 64) a near duplicate may differ by
+        self.dedup_window = 10 # representatives matched within the last N frames (0: whole folder)
+
+        # Video Input (.mp4, .avi, .mov, .mkv in an input folder)
+        self.video_sample_interval = 1.0 # seconds between sampled frames
+
+        # Watch Folder
+        self.watch_settle_seconds = 2.0 # a new file must stay unchanged this long before processing
+
+    def checkTiling(self):
+        # tile_windows steps tile_size - tile_overlap
+        if self.tiled and not (self.tile_size > 0 and 0 <= self.tile_overlap < self.tile_size):
+            raise ValueError(f"Tile overlap must be at least 0 and smaller than the tile size "
+                             f"(tile size {self.tile_size}, overlap {self.tile_overlap})")
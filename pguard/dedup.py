@@ -0,0 +1,75 @@
+from collections import deque
+
+import cv2
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8 # 8x8 dHash -> 64 bit
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Difference hash (int) of an image file or an RGB ndarray (e.g. a video frame)
+
+    Files are decoded at reduced size (JPEG DCT scaling), so hashing costs a fraction of a full decode.
+    """
+    if isinstance(image, np.ndarray):
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    else:
+        with Image.open(image) as pil_image:
+            pil_image.draft("L", ((hash_size + 1) * 8, hash_size * 8))
+            small = np.asarray(pil_image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR))
+
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class Representative():
+    def __init__(self, frame_number, image_hash, image_path):
+        self.frame_number = frame_number # last frame that matched it
+        self.image_hash = image_hash
+        self.image_path = image_path
+        self.result = None # set after inference
+
+
+class NearDuplicateIndex():
+    """Representative frames of one run, matched by dHash hamming distance
+
+    A frame within max_distance bits of a representative is a near duplicate and inherits
+    its result. window > 0 keeps only the representatives matched within the last window
+    frames (a vehicle stopped at lights costs one inference however long it waits),
+    window 0 compares with every representative of the run.
+    """
+
+    def __init__(self, max_distance=4, window=10):
+        self.max_distance = max_distance
+        self.window = window
+        self.frame_count = 0
+        self._representatives = deque() # oldest match first
+
+    def match(self, image_hash, image_path):
+        """-> (Representative, is duplicate). Not a duplicate: image_path is the new representative"""
+        self.frame_count += 1
+        while self.window > 0 and self._representatives and \
+                self._representatives[0].frame_number <= self.frame_count - self.window - 1:
+            self._representatives.popleft()
+
+        best = None
+        for representative in self._representatives:
+            distance = hamming_distance(image_hash, representative.image_hash)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, representative)
+        if best is not None:
+            representative = best[1]
+            representative.frame_number = self.frame_count # seen again, stays in the window
+            self._representatives.remove(representative)
+            self._representatives.append(representative)
+            return representative, True
+
+        representative = Representative(self.frame_count, image_hash, image_path)
+        self._representatives.append(representative)
+        return representative, False
@@ -0,0 +1,461 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+import torch
+from PIL import Image
+from torch import nn
+from mmcv.transforms import Compose
+from mmdet.utils import get_test_pipeline_cfg
+
+from .utils import nms_numpy
+from .video import parse_frame_key, read_video_frame
+
+# ResNet pred_class -> resnet code (0-개구부 아님, 1-정상 개구부, 2-불량 개구부)
+RESNET_CLASS_CODE = {'Y-03': 1, 'N-03': 2}
+
+# Keys of a result dict (make_result)
+RESULT_KEYS = ["image", "image_path", "dino_raw", "dino_keep", "dino_bbox", "dino_score", "dino_label",
+               "resnet_code", "resnet_box_codes", "resnet", "cascade_rejected", "decided_by", "duplicate_of"]
+
+# Tiled detection: boxes this close (px) to an inner tile border are cut by it
+TILE_BORDER_MARGIN = 2
+
+
+def checkpoint_hash(checkpoint_path, cache_dir):
+    """sha256 of a checkpoint, memoized on disk by (size, mtime) so it is read once"""
+    stat = os.stat(checkpoint_path)
+    index_path = os.path.join(cache_dir, "checkpoint_hashes.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    entry = index.get(os.path.abspath(checkpoint_path))
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    sha256 = hashlib.sha256()
+    with open(checkpoint_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+
+    index[os.path.abspath(checkpoint_path)] = {
+        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256.hexdigest()
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+    return sha256.hexdigest()
+
+
+def load_image(image_path):
+    """ndarray of an image file or of a sampled video frame (pguard.video frame key)"""
+    if parse_frame_key(image_path) is not None:
+        return read_video_frame(image_path)
+    return np.array(Image.open(image_path))
+
+
+def build_detector_pipeline(model, scale=None):
+    """mmdet inference_detector와 동일한 test pipeline (ndarray 입력)
+
+    scale: (long edge, short edge) replacing the config Resize scale (None: config value)
+    """
+    cfg = model.cfg.copy()
+    test_pipeline = get_test_pipeline_cfg(cfg)
+    test_pipeline[0].type = 'mmdet.LoadImageFromNDArray'
+    if scale is not None:
+        for transform in test_pipeline:
+            if transform.type in ('Resize', 'mmdet.Resize', 'FixScaleResize', 'mmdet.FixScaleResize'):
+                transform.scale = tuple(scale)
+    return Compose(test_pipeline)
+
+
+def set_decoder_capacity(model, num_queries=None, num_decoder_layers=None):
+    """Inference-only Grounding DINO capacity (None: config value)
+
+    num_queries: proposals selected from the two-stage encoder (top-k), paired with
+    the first num_queries query embeddings like the top ranked proposals of the full model.
+    num_decoder_layers: run only the first decoder layers and read out the last of them
+    (the head predicts every intermediate layer). decoder.num_layers is kept, it indexes
+    the encoder output branch of the head.
+    """
+    if not hasattr(model, "full_decoder_capacity"):
+        model.full_decoder_capacity = (model.num_queries, model.query_embedding, model.decoder.layers)
+    full_num_queries, full_query_embedding, full_layers = model.full_decoder_capacity
+
+    num_queries = full_num_queries if num_queries is None else min(num_queries, full_num_queries)
+    num_decoder_layers = len(full_layers) if num_decoder_layers is None else min(num_decoder_layers, len(full_layers))
+
+    model.num_queries = num_queries
+    if num_queries == full_num_queries:
+        model.query_embedding = full_query_embedding
+    else:
+        model.query_embedding = nn.Embedding.from_pretrained(
+            full_query_embedding.weight[:num_queries].detach(), freeze=True)
+    model.decoder.layers = full_layers[:num_decoder_layers]
+    return num_queries, num_decoder_layers
+
+
+def set_max_detections(model, max_per_img):
+    """Boxes kept per image by the Grounding DINO head (config test_cfg.max_per_img, 1 for frame mode)"""
+    model.bbox_head.test_cfg["max_per_img"] = max_per_img
+
+
+def inference_detector_batch(model, images, text_prompt, test_pipeline=None, custom_entities=False):
+    """images: list of (H, W, C) ndarray -> list of DetDataSample
+
+    Images are grouped by their resized shape and each group goes through a
+    single test_step, so no image is ever zero-padded to a larger neighbour
+    and the outputs match the single-image path.
+    """
+    if test_pipeline is None:
+        test_pipeline = build_detector_pipeline(model)
+
+    packed_list = []
+    for image in images:
+        data_ = dict(img=image, img_id=0, text=text_prompt, custom_entities=custom_entities)
+        packed_list.append(test_pipeline(data_))
+
+    shape_groups = defaultdict(list)
+    for idx, packed in enumerate(packed_list):
+        shape_groups[tuple(packed['inputs'].shape)].append(idx)
+
+    result_list = [None] * len(images)
+    for idxs in shape_groups.values():
+        data_ = dict(
+            inputs=[packed_list[idx]['inputs'] for idx in idxs],
+            data_samples=[packed_list[idx]['data_samples'] for idx in idxs]
+        )
+        with torch.no_grad():
+            results = model.test_step(data_)
+
+        for idx, result in zip(idxs, results):
+            result_list[idx] = result
+
+    return result_list
+
+
+def detect_images(images, gdino_model, text_prompt, gdino_pipeline=None, batch_size=4, custom_entities=False):
+    """images -> list of raw detection dict (bboxes, scores, labels) before the score threshold
+
+    custom_entities: text_prompt is "class a. class b", labels index these classes
+    """
+    dino_raw_list = []
+    for start in range(0, len(images), batch_size):
+        dino_results = inference_detector_batch(
+            gdino_model, images[start:start + batch_size], text_prompt, test_pipeline=gdino_pipeline,
+            custom_entities=custom_entities
+        )
+        for dino_result in dino_results:
+            dino_raw_list.append({
+                "bboxes": dino_result.pred_instances.bboxes.cpu().numpy(),
+                "scores": dino_result.pred_instances.scores.cpu().numpy(),
+                "labels": dino_result.pred_instances.labels.cpu().numpy()
+            })
+    return dino_raw_list
+
+
+def tile_windows(height, width, tile_size, overlap):
+    """(x0, y0, x1, y1) tiles of tile_size covering the frame, neighbours overlap by at least overlap"""
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, tile_size - overlap)) + [length - tile_size]
+
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in starts(height) for x0 in starts(width)]
+
+
+def merge_detections(dino_raw_list, iou_threshold=0.5):
+    """raw detection dicts of one frame -> one raw detection dict, duplicates removed by nms_numpy per label"""
+    if len(dino_raw_list) == 1:
+        return dino_raw_list[0]
+
+    bboxes = np.concatenate([dino_raw["bboxes"] for dino_raw in dino_raw_list])
+    scores = np.concatenate([dino_raw["scores"] for dino_raw in dino_raw_list])
+    labels = np.concatenate([dino_raw["labels"] for dino_raw in dino_raw_list])
+
+    keep_idxs = []
+    for label in np.unique(labels):
+        label_idxs = np.where(labels == label)[0]
+        keep_indices = nms_numpy(bboxes[label_idxs], scores[label_idxs], iou_threshold=iou_threshold)
+        keep_idxs += label_idxs[np.asarray(keep_indices, dtype=np.int64)].tolist()
+    keep_idxs = np.asarray(sorted(keep_idxs, key=lambda idx: -scores[idx]), dtype=np.int64)
+    return {"bboxes": bboxes[keep_idxs], "scores": scores[keep_idxs], "labels": labels[keep_idxs]}
+
+
+def detect_images_tiled(images, gdino_model, text_prompt, gdino_pipeline=None, tile_size=1024, tile_overlap=256,
+                        batch_size=8, full_frame=True, custom_entities=False, iou_threshold=0.5):
+    """detect_images on overlapping tiles, boxes mapped back to frame coordinates
+
+    Tiles are views of the decoded frames and go through the detector batch_size at a
+    time, so peak memory is one batch of resized tiles whatever the frame size. Boxes
+    cut by an inner tile border are dropped (the overlapping tile sees that object whole),
+    full_frame adds the whole resized frame for objects larger than the overlap.
+    Frames no larger than tile_size are detected as a whole, like detect_images.
+    """
+    windows = []
+    for image in images:
+        height, width = image.shape[:2]
+        image_windows = tile_windows(height, width, tile_size, tile_overlap)
+        if full_frame and len(image_windows) > 1:
+            image_windows.append((0, 0, width, height))
+        windows.append(image_windows)
+
+    tiles = [image[y0:y1, x0:x1] for image, image_windows in zip(images, windows) for x0, y0, x1, y1 in image_windows]
+    tile_raw_iter = iter(detect_images(tiles, gdino_model, text_prompt, gdino_pipeline, batch_size=batch_size,
+                                       custom_entities=custom_entities))
+
+    dino_raw_list = []
+    for image, image_windows in zip(images, windows):
+        height, width = image.shape[:2]
+        frame_raw_list = []
+        for x0, y0, x1, y1 in image_windows:
+            tile_raw = next(tile_raw_iter)
+            bboxes = tile_raw["bboxes"]
+            keep = np.ones(len(bboxes), dtype=bool)
+            if x0 > 0:
+                keep &= bboxes[:, 0] > TILE_BORDER_MARGIN
+            if y0 > 0:
+                keep &= bboxes[:, 1] > TILE_BORDER_MARGIN
+            if x1 < width:
+                keep &= bboxes[:, 2] < x1 - x0 - TILE_BORDER_MARGIN
+            if y1 < height:
+                keep &= bboxes[:, 3] < y1 - y0 - TILE_BORDER_MARGIN
+            frame_raw_list.append({
+                "bboxes": bboxes[keep] + np.array([x0, y0, x0, y0], dtype=bboxes.dtype),
+                "scores": tile_raw["scores"][keep],
+                "labels": tile_raw["labels"][keep]
+            })
+        dino_raw_list.append(merge_detections(frame_raw_list, iou_threshold=iou_threshold))
+    return dino_raw_list
+
+
+def filter_detection_indices(dino_raw, score_thr, iou_threshold=0.5):
+    """raw detection dict -> indices of the raw boxes kept by score threshold + NMS"""
+    candidate_idxs = np.where(dino_raw["scores"] > score_thr)[0]
+    keep_indices = nms_numpy(dino_raw["bboxes"][candidate_idxs], dino_raw["scores"][candidate_idxs],
+                             iou_threshold=iou_threshold)
+    return candidate_idxs[np.asarray(keep_indices, dtype=np.int64)]
+
+
+def filter_detections(dino_raw, score_thr, iou_threshold=0.5):
+    """raw detection dict -> score threshold + NMS 이후의 (bboxes, scores, labels)"""
+    keep_idxs = filter_detection_indices(dino_raw, score_thr, iou_threshold=iou_threshold)
+    return dino_raw["bboxes"][keep_idxs], dino_raw["scores"][keep_idxs], dino_raw["labels"][keep_idxs]
+
+
+def rollup_box_codes(box_codes):
+    """per-box resnet codes -> image code (불량 개구부가 하나라도 있으면 2)"""
+    if len(box_codes) == 0:
+        return 0
+    if any(box_code is None for box_code in box_codes):
+        return None
+    return max(box_codes)
+
+
+def empty_detection():
+    # raw detection dict of an image the detector never saw (cascade rejected)
+    return {
+        "bboxes": np.zeros((0, 4), dtype=np.float32),
+        "scores": np.zeros((0,), dtype=np.float32),
+        "labels": np.zeros((0,), dtype=np.int64)
+    }
+
+
+def detector_label_codes(dino_raw, label_policy):
+    """raw boxes -> resnet code decided by the detector label (None if ambiguous)
+
+    label_policy: list indexed by detector label of (resnet code, score margin).
+    A box is decided by its label when its score clears the margin of that label.
+    """
+    if label_policy is None:
+        return [None] * len(dino_raw["scores"])
+
+    label_codes = []
+    for score, label in zip(dino_raw["scores"], dino_raw["labels"]):
+        code, margin = label_policy[int(label)]
+        label_codes.append(code if score >= margin else None)
+    return label_codes
+
+
+def make_result(image_path, dino_raw, score_thr, resnet_code=None, resnet_box_codes=None, cascade_rejected=False,
+                label_policy=None, duplicate_of=None):
+    """result dict of one image
+
+    resnet_code: ResNet code of the whole frame, independent of the threshold (None if never classified)
+    resnet_box_codes: crop mode only, code per raw box (None if that box was never classified)
+    resnet: image code after the threshold, 0 if no box survives (None = positive but not classified yet)
+    cascade_rejected: the presence gate skipped the detector (dino_raw is empty)
+    label_policy: see detector_label_codes. The detector label decides the image when a
+        kept box is a confident abnormal opening or every kept box is confident.
+    duplicate_of: image_path of the representative frame whose detections and codes this
+        near-duplicate frame inherited (pguard.dedup)
+    decided_by: stage that decided the image code ("duplicate", "cascade", "detector", "dino_label" or "resnet")
+    """
+    keep_idxs = filter_detection_indices(dino_raw, score_thr)
+    label_codes = detector_label_codes(dino_raw, label_policy)
+    kept_label_codes = [label_codes[idx] for idx in keep_idxs]
+    # 불량 개구부가 확실하면 나머지 박스와 무관하게 2
+    label_decided = len(keep_idxs) >= 1 and (2 in kept_label_codes or None not in kept_label_codes)
+
+    if resnet_box_codes is not None:
+        # Confident boxes need no crop classification
+        resnet_box_codes = [box_code if label_code is None else label_code
+                            for box_code, label_code in zip(resnet_box_codes, label_codes)]
+
+    if label_decided:
+        resnet = max(label_code for label_code in kept_label_codes if label_code is not None)
+    elif resnet_box_codes is None:
+        resnet = resnet_code if len(keep_idxs) >= 1 else 0
+    else:
+        resnet = rollup_box_codes([resnet_box_codes[idx] for idx in keep_idxs])
+
+    if duplicate_of is not None:
+        decided_by = "duplicate"
+    elif cascade_rejected:
+        decided_by = "cascade"
+    elif len(keep_idxs) == 0:
+        decided_by = "detector"
+    elif label_decided:
+        decided_by = "dino_label"
+    else:
+        decided_by = "resnet"
+
+    return {
+        "image": os.path.basename(image_path),
+        "image_path": image_path,
+        "dino_raw": dino_raw,
+        "dino_keep": keep_idxs,
+        "dino_bbox": dino_raw["bboxes"][keep_idxs],
+        "dino_score": dino_raw["scores"][keep_idxs],
+        "dino_label": dino_raw["labels"][keep_idxs],
+        "resnet_code": resnet_code,
+        "resnet_box_codes": resnet_box_codes,
+        "resnet": resnet,
+        "cascade_rejected": cascade_rejected,
+        "decided_by": decided_by,
+        "duplicate_of": duplicate_of
+    }
+
+
+def copy_box_codes(resnet_box_codes):
+    # Per-result copy (classify_results fills box codes in place)
+    return list(resnet_box_codes) if resnet_box_codes is not None else None
+
+
+def initial_box_codes(dino_raw, resnet_mode):
+    return [None] * len(dino_raw["scores"]) if resnet_mode == "crop" else None
+
+
+def crop_box(image, bbox, margin):
+    """bbox (x1, y1, x2, y2) + margin (ratio of box size) -> image crop"""
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = bbox
+    margin_x = (x2 - x1) * margin
+    margin_y = (y2 - y1) * margin
+
+    x1 = int(np.clip(np.floor(x1 - margin_x), 0, width - 1))
+    y1 = int(np.clip(np.floor(y1 - margin_y), 0, height - 1))
+    x2 = int(np.clip(np.ceil(x2 + margin_x), x1 + 1, width))
+    y2 = int(np.clip(np.ceil(y2 + margin_y), y1 + 1, height))
+    return image[y1:y2, x1:x2]
+
+
+def classify_images(resnet_model, images, batch_size=32):
+    """images: list of ndarray -> list of resnet code (1 or 2, 0 if unknown)"""
+    if len(images) == 0:
+        return []
+
+    resnet_results = resnet_model(images, batch_size=batch_size)
+    return [RESNET_CLASS_CODE.get(resnet_result['pred_class'], 0) for resnet_result in resnet_results]
+
+
+def classify_results(results, resnet_model, images=None, batch_size=32, crop_margin=0.2):
+    """Fill resnet code of positive results that are not classified yet (in place)
+
+    Frame mode results are classified as a whole image, crop mode results
+    (resnet_box_codes is not None) per unclassified kept box. All frames or
+    crops go through one batched inferencer call. Returns the updated indices.
+    """
+    target_idxs = [idx for idx, result in enumerate(results) if result["resnet"] is None]
+
+    inputs = []
+    input_owners = [] # (result idx, raw box idx or None)
+    for idx in target_idxs:
+        image = images[idx] if images is not None else load_image(results[idx]["image_path"])
+        result = results[idx]
+
+        if result["resnet_box_codes"] is None:
+            inputs.append(image)
+            input_owners.append((idx, None))
+        else:
+            for box_idx in result["dino_keep"]:
+                if result["resnet_box_codes"][box_idx] is None:
+                    inputs.append(crop_box(image, result["dino_raw"]["bboxes"][box_idx], crop_margin))
+                    input_owners.append((idx, int(box_idx)))
+
+    resnet_codes = classify_images(resnet_model, inputs, batch_size=batch_size)
+    for (idx, box_idx), resnet_code in zip(input_owners, resnet_codes):
+        if box_idx is None:
+            results[idx]["resnet_code"] = resnet_code
+        else:
+            results[idx]["resnet_box_codes"][box_idx] = resnet_code
+
+    for idx in target_idxs:
+        result = results[idx]
+        if result["resnet_box_codes"] is None:
+            result["resnet"] = result["resnet_code"]
+        else:
+            result["resnet"] = rollup_box_codes([result["resnet_box_codes"][box_idx] for box_idx in result["dino_keep"]])
+
+    return target_idxs
+
+
+def infer_images(image_paths, gdino_model, resnet_model, text_prompt, score_thr,
+                 gdino_pipeline=None, gdino_batch_size=4, resnet_batch_size=32, resnet_mode="frame", crop_margin=0.2,
+                 presence_gate=None, cascade_thr=0.05, cascade_batch_size=64, custom_entities=False, label_policy=None,
+                 tiling=None, images=None):
+    """image paths -> list of result dict (see make_result)
+
+    presence_gate: optional cheap classifier (pguard.cascade.PresenceGate). Images whose
+    presence score is below cascade_thr skip Grounding DINO and ResNet.
+    label_policy: ResNet runs only on images (boxes) the detector label leaves ambiguous.
+    tiling: detect_images_tiled arguments (tile_size, tile_overlap, batch_size, full_frame),
+        None detects each frame as a whole.
+    images: already decoded images (e.g. streamed video frames), None entries are loaded from image_paths
+    """
+    # Load Image
+    if images is None:
+        images = [None] * len(image_paths)
+    images = [load_image(image_path) if image is None else image for image_path, image in zip(image_paths, images)]
+
+    # Presence Gate (Batch)
+    detect_idxs = list(range(len(images)))
+    if presence_gate is not None:
+        gate_scores = presence_gate.scores(images, batch_size=cascade_batch_size)
+        detect_idxs = [idx for idx, gate_score in enumerate(gate_scores) if gate_score >= cascade_thr]
+
+    # Grounding DINO (Batch, only images passing the gate)
+    if tiling is not None:
+        dino_raw_list = detect_images_tiled([images[idx] for idx in detect_idxs], gdino_model, text_prompt,
+                                            gdino_pipeline, custom_entities=custom_entities, **tiling)
+    else:
+        dino_raw_list = detect_images([images[idx] for idx in detect_idxs], gdino_model, text_prompt, gdino_pipeline,
+                                      batch_size=gdino_batch_size, custom_entities=custom_entities)
+    results = [
+        make_result(image_path, empty_detection(), score_thr, cascade_rejected=True)
+        for image_path in image_paths
+    ]
+    for idx, dino_raw in zip(detect_idxs, dino_raw_list):
+        results[idx] = make_result(image_paths[idx], dino_raw, score_thr,
+                                   resnet_box_codes=initial_box_codes(dino_raw, resnet_mode), label_policy=label_policy)
+
+    # ResNet (Batch, only images with detections)
+    classify_results(results, resnet_model, images=images, batch_size=resnet_batch_size, crop_margin=crop_margin)
+
+    return results
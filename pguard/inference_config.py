@@ -0,0 +1,87 @@
+import copy
+import hashlib
+import os
+
+from mmengine.config import Config
+
+# Bump when the stripping rules change, older compiled configs are rebuilt
+INFERENCE_CONFIG_VERSION = 1
+
+# Top-level keys an inference config keeps, everything else (custom_imports, dataloaders, optimizer,
+# schedulers, hooks, visualizer, load_from, work_dir, ...) is training / evaluation only
+INFERENCE_KEYS = ["default_scope", "model", "data_preprocessor", "test_pipeline"]
+
+# Test pipeline transforms that need annotations
+TRAIN_ONLY_TRANSFORMS = ("LoadAnnotations", "mmdet.LoadAnnotations")
+
+
+def _strip_model(cfg):
+    """Recursively disable activation checkpointing and drop pretrained init of the submodule configs"""
+    if isinstance(cfg, dict):
+        stripped = {}
+        for key, value in cfg.items():
+            if key in ("with_cp", "use_checkpoint"):
+                value = False
+            elif key == "init_cfg" and isinstance(value, dict) and value.get("type") == "Pretrained":
+                continue # weights come from the checkpoint
+            stripped[key] = _strip_model(value)
+        return stripped
+    if isinstance(cfg, (list, tuple)):
+        return type(cfg)(_strip_model(value) for value in cfg)
+    return cfg
+
+
+def _strip_pipeline(pipeline):
+    return [transform for transform in pipeline if transform["type"] not in TRAIN_ONLY_TRANSFORMS]
+
+
+def strip_config(cfg):
+    """Inference-only copy of an mmdet / mmpretrain training config (plain dict)
+
+    model: no gradient checkpointing (with_cp / use_checkpoint), no denoising query
+    generator (dn_cfg) and no assigner (train_cfg), they are only built for training.
+    test_dataloader keeps only dataset.pipeline and metainfo, where mmdet
+    (get_test_pipeline_cfg) and mmpretrain (ImageClassificationInferencer) read them.
+    """
+    cfg_dict = cfg.to_dict()
+    stripped = {key: copy.deepcopy(cfg_dict[key]) for key in INFERENCE_KEYS if key in cfg_dict}
+
+    model = _strip_model(stripped["model"])
+    model.pop("dn_cfg", None)
+    model.pop("train_cfg", None)
+    stripped["model"] = model
+
+    if "test_pipeline" in stripped:
+        stripped["test_pipeline"] = _strip_pipeline(stripped["test_pipeline"])
+
+    if "test_dataloader" in cfg_dict:
+        test_dataset = cfg_dict["test_dataloader"]["dataset"]
+        while "pipeline" not in test_dataset and "dataset" in test_dataset: # wrapped datasets
+            test_dataset = test_dataset["dataset"]
+        dataset = {"pipeline": _strip_pipeline(copy.deepcopy(test_dataset["pipeline"]))}
+        for key in ("metainfo", "classes"):
+            if key in test_dataset:
+                dataset[key] = copy.deepcopy(test_dataset[key])
+        stripped["test_dataloader"] = {"dataset": dataset}
+    return stripped
+
+
+def compile_inference_config(config_path, cache_dir):
+    """Path of the inference-only config of config_path, built once and cached in cache_dir
+
+    Keyed by the config file content, so editing the training config rebuilds it. Later
+    launches parse only the small compiled file (no custom_imports, no dataset modules).
+    """
+    with open(config_path, "rb") as f:
+        config_hash = hashlib.sha1(f.read() + f"\0{INFERENCE_CONFIG_VERSION}".encode("utf-8")).hexdigest()
+    name = os.path.splitext(os.path.basename(config_path))[0]
+    compiled_path = os.path.join(cache_dir, "inference_config", f"{name}_{config_hash[:16]}.py")
+    if os.path.exists(compiled_path):
+        return compiled_path
+
+    stripped = strip_config(Config.fromfile(config_path))
+    os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+    tmp_path = compiled_path + ".tmp.py"
+    Config(stripped).dump(tmp_path)
+    os.replace(tmp_path, compiled_path)
+    return compiled_path
@@ -0,0 +1,26 @@
+import threading
+from concurrent.futures import Future
+
+from .pipeline import Pipeline
+
+
+def load_pipeline_async(config, progress=None):
+    """Build a Pipeline on a background thread
+
+    Returns a concurrent.futures.Future resolved with the Pipeline (or the loading
+    error). Inference waits on future.result(), everything else can run meanwhile.
+    progress(message) is called from the loading thread.
+    """
+    future = Future()
+
+    def load():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(Pipeline(config, progress=progress))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # daemon: closing the app does not wait for a load in progress
+    threading.Thread(target=load, name="pguard-model-loader", daemon=True).start()
+    return future
@@ -0,0 +1,183 @@
+import collections
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+
+
+def model_server_available():
+    return "AF_UNIX" in multiprocessing.connection.families
+
+
+class _Job():
+    def __init__(self, command, args):
+        self.command = command
+        self.args = args
+        self.reply = None
+        self.done = threading.Event()
+
+
+class ModelServer():
+    """Long-lived owner of one loaded Pipeline, shared by GUI and CLI clients over a Unix domain socket
+
+    Every client connection has its own thread, the models run on a single inference
+    thread. Infer requests arriving within batch_window seconds with the same per-call
+    settings (Pipeline.inferKwargs) are run together, up to max_batch images.
+    Requests are (command, args) tuples, replies ("ok", value) or ("error", exception).
+    """
+
+    def __init__(self, pipeline, socket_path, batch_window=0.05, max_batch=None):
+        self.pipeline = pipeline
+        self.socket_path = socket_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch if max_batch is not None else pipeline.config.inference_chunk_size
+        self.server_key = pipeline.serverKey()
+        self._jobs = queue.Queue()
+
+    def serveForever(self):
+        if os.path.exists(self.socket_path):
+            try:
+                multiprocessing.connection.Client(self.socket_path, family="AF_UNIX").close()
+                raise RuntimeError(f"A model server is already running on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path) # stale socket of a killed server
+
+        # Owner only socket (clients run as the same user)
+        umask = os.umask(0o177)
+        try:
+            listener = multiprocessing.connection.Listener(self.socket_path, family="AF_UNIX")
+        finally:
+            os.umask(umask)
+
+        threading.Thread(target=self._inferenceLoop, name="pguard-model-server", daemon=True).start()
+        try:
+            while True:
+                connection = listener.accept()
+                threading.Thread(target=self._serveClient, args=(connection,), daemon=True).start()
+        finally:
+            listener.close() # removes the socket file
+
+    def _serveClient(self, connection):
+        try:
+            while True:
+                command, args = connection.recv()
+                if command == "hello":
+                    if args[0] == self.server_key:
+                        reply = ("ok", None)
+                    else:
+                        reply = ("error", RuntimeError("The model server runs other models or settings"))
+                else:
+                    job = _Job(command, args)
+                    self._jobs.put(job)
+                    job.done.wait()
+                    reply = job.reply
+                connection.send(reply)
+        except (EOFError, OSError):
+            pass # client closed
+        finally:
+            connection.close()
+
+    def _inferenceLoop(self):
+        pending = collections.deque() # jobs taken from the queue while batching, run next
+        while True:
+            job = pending.popleft() if pending else self._jobs.get()
+            if job.command != "infer":
+                self._runJobs([job])
+                continue
+
+            # Batch Window (infer requests of any client with the same settings)
+            jobs = [job]
+            for other in list(pending):
+                if other.command == "infer" and other.args[1] == job.args[1]:
+                    pending.remove(other)
+                    jobs.append(other)
+            deadline = time.perf_counter() + self.batch_window
+            while sum(len(batch_job.args[0]) for batch_job in jobs) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    other = self._jobs.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if other.command == "infer" and other.args[1] == job.args[1]:
+                    jobs.append(other)
+                else:
+                    pending.append(other)
+            self._runJobs(jobs)
+
+    def _runJobs(self, jobs):
+        command = jobs[0].command
+        try:
+            if command == "infer":
+                image_paths = [image_path for job in jobs for image_path in job.args[0]]
+                infer_kwargs = jobs[0].args[1]
+                images = None # decoded images sent by the clients (video frames), None entries are loaded
+                if any(job.args[2] is not None for job in jobs):
+                    images = [image for job in jobs for image in (job.args[2] or [None] * len(job.args[0]))]
+                chunk_size = self.pipeline.config.inference_chunk_size
+                results = []
+                for start in range(0, len(image_paths), chunk_size):
+                    results += self.pipeline.inferImagesWith(
+                        image_paths[start:start + chunk_size], infer_kwargs,
+                        images[start:start + chunk_size] if images is not None else None
+                    )
+
+                offset = 0
+                for job in jobs:
+                    job.reply = ("ok", results[offset:offset + len(job.args[0])])
+                    offset += len(job.args[0])
+            elif command == "classify":
+                results = jobs[0].args[0]
+                classified_idxs = self.pipeline.classifyResults(results)
+                jobs[0].reply = ("ok", (results, classified_idxs))
+            elif command == "check_prompt":
+                self.pipeline.checkDetectorPrompt(*jobs[0].args)
+                jobs[0].reply = ("ok", None)
+            else:
+                jobs[0].reply = ("error", ValueError(f"Unknown model server command: {command}"))
+        except Exception as e:
+            for job in jobs:
+                job.reply = ("error", e)
+
+        for job in jobs:
+            job.done.set()
+
+
+class ModelClient():
+    """Connection to a ModelServer (thread safe, one request at a time)"""
+
+    def __init__(self, socket_path, server_key):
+        self.connection = multiprocessing.connection.Client(socket_path, family="AF_UNIX")
+        self._lock = threading.Lock()
+        try:
+            self.call("hello", server_key)
+        except RuntimeError:
+            self.connection.close()
+            raise
+
+    def call(self, command, *args):
+        with self._lock:
+            self.connection.send((command, args))
+            status, value = self.connection.recv()
+        if status == "error":
+            raise value
+        return value
+
+    def close(self):
+        self.connection.close()
+
+
+def connect_model_server(socket_path, server_key):
+    """ModelClient of a running `pguard serve`, None if there is none (load the models in process)"""
+    if not model_server_available() or not os.path.exists(socket_path):
+        return None
+
+    try:
+        model_client = ModelClient(socket_path, server_key)
+    except (OSError, EOFError, RuntimeError) as e:
+        print(f"Model server not used ({e}). Load the models in this process.")
+        return None
+    print(f"Using the model server on {socket_path}")
+    return model_client
@@ -0,0 +1,243 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from mmcv.transforms import Compose
+from mmengine.config import Config
+from mmengine.dataset import pseudo_collate
+from torch import nn
+
+from .dnn_functions import build_detector_pipeline
+from .prompt_cache import PromptNotCachedError
+
+
+def detector_onnx_name(text_prompt, custom_entities, input_shape):
+    key = hashlib.sha1(f"{text_prompt}\0{custom_entities}\0{input_shape[0]}x{input_shape[1]}".encode("utf-8"))
+    return f"grounding_dino_{key.hexdigest()[:16]}"
+
+
+def make_session(onnx_path, intra_op_threads=0, inter_op_threads=0):
+    """onnxruntime CPU session, all graph optimizations (0 threads = onnxruntime default)"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    if inter_op_threads > 1:
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+
+# Export
+class DetectorExportWrapper(nn.Module):
+    """Grounding DINO image branch with fixed text features -> last decoder layer (cls_scores, bbox_preds)"""
+
+    def __init__(self, model, text_dict, data_samples):
+        super().__init__()
+        self.model = model
+        self.data_samples = data_samples
+        self.text_keys = list(text_dict.keys())
+        for key, value in text_dict.items():
+            self.register_buffer(f"text_{key}", value)
+
+    def forward(self, inputs):
+        text_dict = {key: getattr(self, f"text_{key}") for key in self.text_keys}
+        visual_feats = self.model.extract_feat(inputs)
+        head_inputs_dict = self.model.forward_transformer(visual_feats, text_dict, self.data_samples)
+        all_layers_cls_scores, all_layers_bbox_preds = self.model.bbox_head(**head_inputs_dict)
+        return all_layers_cls_scores[-1], all_layers_bbox_preds[-1]
+
+
+class ClassifierExportWrapper(nn.Module):
+    """mmpretrain ImageClassifier -> softmax scores (same as ClsHead.predict)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, inputs):
+        return F.softmax(self.model.head(self.model.extract_feat(inputs)), dim=1)
+
+
+def export_detector(model, prompt_cache, text_prompt, custom_entities, image, onnx_folder, checkpoint_sha256,
+                    test_pipeline=None, opset_version=16):
+    """Export Grounding DINO for the resized input shape of image and one text prompt
+
+    -> (onnx path, input shape). Metadata (prompt, token positive map) is saved next to it as json.
+    """
+    if test_pipeline is None:
+        test_pipeline = build_detector_pipeline(model)
+    packed = test_pipeline(dict(img=image, img_id=0, text=text_prompt, custom_entities=custom_entities))
+    data = model.data_preprocessor(dict(inputs=[packed['inputs']], data_samples=[packed['data_samples']]), False)
+    inputs, data_samples = data['inputs'], data['data_samples']
+    input_shape = tuple(inputs.shape[-2:])
+
+    # Fixed Text Features (same as GroundingDINO.predict)
+    token_positive_map, caption_string, _, _ = prompt_cache.get_tokens_positive_and_prompts(text_prompt, custom_entities)
+    text_dict = dict(prompt_cache.getTextFeatures(caption_string))
+    with torch.no_grad():
+        if model.text_feat_map is not None:
+            text_dict['embedded'] = model.text_feat_map(text_dict['embedded'])
+
+    name = detector_onnx_name(text_prompt, custom_entities, input_shape)
+    onnx_path = os.path.join(onnx_folder, f"{name}.onnx")
+    os.makedirs(onnx_folder, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            DetectorExportWrapper(model, text_dict, data_samples).eval(), (inputs,), onnx_path,
+            input_names=["inputs"], output_names=["cls_scores", "bbox_preds"], opset_version=opset_version
+        )
+
+    with open(os.path.join(onnx_folder, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "onnx": os.path.basename(onnx_path),
+            "text_prompt": text_prompt,
+            "custom_entities": custom_entities,
+            "input_shape": list(input_shape),
+            "token_positive_map": {str(label): tokens for label, tokens in token_positive_map.items()},
+            "checkpoint_sha256": checkpoint_sha256
+        }, f, indent=2)
+    return onnx_path, input_shape
+
+
+def export_classifier(resnet_model, onnx_folder, checkpoint_sha256, input_size=224, opset_version=16):
+    """Export the ResNet classifier (dynamic batch) -> onnx path, classes saved in resnet.json"""
+    onnx_path = os.path.join(onnx_folder, "resnet.onnx")
+    os.makedirs(onnx_folder, exist_ok=True)
+    inputs = torch.randn(1, 3, input_size, input_size, device=resnet_model.model.data_preprocessor.device)
+    with torch.no_grad():
+        torch.onnx.export(
+            ClassifierExportWrapper(resnet_model.model).eval(), (inputs,), onnx_path,
+            input_names=["inputs"], output_names=["pred_scores"], opset_version=opset_version,
+            dynamic_axes={"inputs": {0: "batch"}, "pred_scores": {0: "batch"}}
+        )
+
+    with open(os.path.join(onnx_folder, "resnet.json"), "w", encoding="utf-8") as f:
+        json.dump({"onnx": "resnet.onnx", "classes": list(resnet_model.classes),
+                   "checkpoint_sha256": checkpoint_sha256}, f, indent=2)
+    return onnx_path
+
+
+# Runtime
+class OnnxDetector():
+    """onnxruntime Grounding DINO with the mmdet model interface used by inference_detector_batch
+
+    cfg -> test pipeline, test_step -> DetDataSample with pred_instances. Pre-processing
+    (test pipeline + DetDataPreprocessor) and post-processing (GroundingDINOHead.predict_by_feat)
+    are the mmdet ones, only the network runs in onnxruntime. One graph per (prompt, input shape).
+    """
+
+    def __init__(self, config_path, onnx_folder, checkpoint_sha256=None, intra_op_threads=0, inter_op_threads=0):
+        from mmdet.registry import MODELS
+        from mmdet.utils import register_all_modules
+        register_all_modules()
+
+        self.cfg = Config.fromfile(config_path)
+        self.data_preprocessor = MODELS.build(self.cfg.model.data_preprocessor)
+
+        bbox_head_cfg = self.cfg.model.bbox_head.copy()
+        bbox_head_cfg.update(test_cfg=self.cfg.model.test_cfg)
+        self.bbox_head = MODELS.build(bbox_head_cfg)
+
+        self.onnx_folder = onnx_folder
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._sessions = {}
+
+        # (prompt, custom_entities, input shape) -> metadata
+        self.exports = {}
+        for meta_path in glob.glob(os.path.join(onnx_folder, "grounding_dino_*.json")):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if checkpoint_sha256 is not None and meta["checkpoint_sha256"] != checkpoint_sha256:
+                print(f"{meta_path} was exported from another checkpoint. Skip it.")
+                continue
+            self.exports[(meta["text_prompt"], meta["custom_entities"], tuple(meta["input_shape"]))] = meta
+
+    def checkPrompt(self, text_prompt, custom_entities=False):
+        if not any(key[:2] == (text_prompt, custom_entities) for key in self.exports):
+            raise PromptNotCachedError(
+                f"Text prompt {text_prompt} is not exported to ONNX (run `pguard export-onnx`)")
+
+    def session(self, text_prompt, custom_entities, input_shape):
+        key = (text_prompt, custom_entities, tuple(input_shape))
+        if key not in self.exports:
+            raise PromptNotCachedError(
+                f"No ONNX graph for text prompt {text_prompt} and input shape {input_shape} "
+                f"(run `pguard export-onnx` on images of this size)")
+
+        if key not in self._sessions:
+            meta = self.exports[key]
+            token_positive_map = {int(label): tokens for label, tokens in meta["token_positive_map"].items()}
+            self._sessions[key] = (
+                make_session(os.path.join(self.onnx_folder, meta["onnx"]), self.intra_op_threads, self.inter_op_threads),
+                token_positive_map
+            )
+        return self._sessions[key]
+
+    def test_step(self, data):
+        data = self.data_preprocessor(data, False)
+        for inputs, data_sample in zip(data['inputs'], data['data_samples']):
+            session, token_positive_map = self.session(
+                data_sample.text, data_sample.custom_entities, tuple(inputs.shape[-2:]))
+            cls_scores, bbox_preds = session.run(None, {"inputs": inputs[None].numpy()})
+
+            data_sample.pred_instances = self.bbox_head.predict_by_feat(
+                torch.from_numpy(cls_scores)[None], torch.from_numpy(bbox_preds)[None],
+                batch_img_metas=[data_sample.metainfo], batch_token_positive_maps=[token_positive_map], rescale=True
+            )[0]
+        return data['data_samples']
+
+
+class OnnxClassifier():
+    """onnxruntime ResNet with the ImageClassificationInferencer call interface used by classify_images
+
+    Pre-processing is the config test pipeline + ClsDataPreprocessor, like the inferencer.
+    """
+
+    def __init__(self, config_path, onnx_folder, checkpoint_sha256=None, intra_op_threads=0, inter_op_threads=0):
+        from mmpretrain.registry import MODELS, TRANSFORMS
+        from mmpretrain.utils import register_all_modules
+        register_all_modules()
+
+        cfg = Config.fromfile(config_path)
+        pipeline_cfg = cfg.test_dataloader.dataset.pipeline
+        if pipeline_cfg[0]['type'] == 'LoadImageFromFile':
+            pipeline_cfg = pipeline_cfg[1:]
+        self.pipeline = Compose([TRANSFORMS.build(transform) for transform in pipeline_cfg])
+
+        data_preprocessor_cfg = cfg.get('data_preprocessor', cfg.model.get('data_preprocessor', {})).copy()
+        data_preprocessor_cfg.setdefault('type', 'ClsDataPreprocessor')
+        self.data_preprocessor = MODELS.build(data_preprocessor_cfg)
+
+        with open(os.path.join(onnx_folder, "resnet.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if checkpoint_sha256 is not None and meta["checkpoint_sha256"] != checkpoint_sha256:
+            print(f"{onnx_folder}/resnet.onnx was exported from another checkpoint. Re-run `pguard export-onnx`.")
+        self.classes = meta["classes"]
+        self.session = make_session(os.path.join(onnx_folder, meta["onnx"]), intra_op_threads, inter_op_threads)
+
+    def __call__(self, images, batch_size=32):
+        results = []
+        for start in range(0, len(images), batch_size):
+            packed_list = [
+                self.pipeline(dict(img=image, img_shape=image.shape[:2], ori_shape=image.shape[:2]))
+                for image in images[start:start + batch_size]
+            ]
+            inputs = self.data_preprocessor(pseudo_collate(packed_list), False)['inputs']
+            pred_scores, = self.session.run(None, {"inputs": inputs.numpy()})
+
+            for scores in pred_scores:
+                pred_label = int(np.argmax(scores))
+                results.append({
+                    'pred_scores': scores,
+                    'pred_label': pred_label,
+                    'pred_score': float(scores[pred_label]),
+                    'pred_class': self.classes[pred_label]
+                })
+        return results
@@ -0,0 +1,787 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from mmdet.apis import init_detector
+from mmpretrain import ImageClassificationInferencer
+
+from .ai_pool import InferencePool, fork_available
+from .cascade import PresenceGate, calibrate_threshold
+from .compiled import apply_compile, enable_compile_cache
+from .dedup import NearDuplicateIndex, dhash
+from .config import RESOLUTION_PROFILES
+from .dnn_functions import (build_detector_pipeline, checkpoint_hash, infer_images, make_result, classify_results,
+                            classify_images, initial_box_codes, detect_images, filter_detection_indices, load_image,
+                            set_decoder_capacity, set_max_detections, copy_box_codes, RESULT_KEYS)
+from .inference_config import compile_inference_config
+from .model_server import connect_model_server
+from .onnx_backend import OnnxClassifier, OnnxDetector, export_classifier, export_detector
+from .precision import apply_module_precision, compare_results, restore_module_precision
+from .prompt_cache import PromptCache
+from .quantize import (load_quantized_language_model, load_quantized_resnet_backbone, quantize_language_model,
+                       quantize_resnet_backbone)
+from .result_cache import ResultCache, file_hash
+from .video import frame_key, is_video, parse_frame_key, sample_video_frames, video_sample_count
+
+IMAGE_EXTENSIONS = (".jpg", ".png")
+
+# resnet: 0-개구부 아님, 1-정상 개구부, 2-불량 개구부
+CLASSIFICATION_MAP = {0: "개구부 없음", 1: "정상", 2: "비정상(열림)"}
+
+# decided_by -> table text
+DECISION_MAP = {"duplicate": "상속 (중복 프레임)", "cascade": "Cascade", "detector": "DINO (미검출)", "dino_label": "DINO 라벨", "resnet": "ResNet"}
+
+# Pipeline.stage_counts keys (in pipeline order)
+STAGE_COUNT_KEYS = ["frames", "duplicates", "cache_hits", "cascade_rejected", "detector_rejected", "label_decided", "classified"]
+
+
+def list_images(folder):
+    # Sorted by name: capture order for camera file names, which near-duplicate skipping relies on
+    return [os.path.join(folder, file) for file in sorted(os.listdir(folder)) if file.endswith(IMAGE_EXTENSIONS)]
+
+
+def list_inputs(folder):
+    # Images and videos (Pipeline.run samples the videos), sorted by name like list_images
+    return [os.path.join(folder, file) for file in sorted(os.listdir(folder))
+            if file.endswith(IMAGE_EXTENSIONS) or is_video(file)]
+
+
+def count_frames(image_paths, video_sample_interval):
+    # Number of results Pipeline.run yields for image_paths
+    return sum(video_sample_count(image_path, video_sample_interval) if is_video(image_path) else 1
+               for image_path in image_paths)
+
+
+class Pipeline():
+    """Qt-free Grounding DINO -> NMS -> ResNet pipeline
+
+    run() yields one result dict per image (RESULT_KEYS):
+    image, image_path, dino_raw, dino_keep, dino_bbox (N, 4), dino_score (N,), dino_label (N,),
+    resnet_code, resnet_box_codes, resnet (0/1/2), cascade_rejected, decided_by, duplicate_of
+
+    stage_counts counts how many frames of the last run() each stage eliminated
+    ("duplicates": inferences saved by near-duplicate skipping).
+    progress(message) is called before each loading step (see pguard.loader).
+    """
+
+    def __init__(self, config, progress=None):
+        self.config = config
+        self.progress = progress
+        self._optional_checkpoint_hashes = {}
+        config.checkTiling()
+
+        # Load AI Model (or use a running model server, see pguard.model_server)
+        self.reportProgress("Checking model files")
+        gdino_checkpoint_hash = checkpoint_hash(config.gdino_checkpoint_path, config.dnn_cache_folder)
+        resnet_checkpoint_hash = checkpoint_hash(config.resnet_checkpoint_path, config.dnn_cache_folder)
+        self.gdino_config_path = self.modelConfigPath(config.gdino_config_path)
+        self.resnet_config_path = self.modelConfigPath(config.resnet_config_path)
+        self.model_client = None
+        if config.model_server:
+            self.model_client = connect_model_server(config.model_server_socket, self.serverKey())
+        if self.model_client is not None:
+            self.gdino_model = self.resnet_model = self.prompt_cache = None
+        elif config.backend == "onnxruntime":
+            self.loadOnnxModels(gdino_checkpoint_hash, resnet_checkpoint_hash)
+        else:
+            self.loadTorchModels(gdino_checkpoint_hash)
+        self._gdino_pipelines = {}
+        local_models = self.model_client is None
+
+        # Presence Gate (Cascade)
+        self.presence_gate = None
+        if config.cascade and local_models:
+            self.reportProgress("Loading presence classifier")
+            self.presence_gate = PresenceGate(
+                self.modelConfigPath(config.cascade_config_path), config.cascade_checkpoint_path, config.device,
+                config.cascade_positive_classes, input_size=config.cascade_input_size
+            )
+
+        # Result Cache (image content hash -> raw detection + resnet code)
+        self.result_cache = None
+        if config.result_cache:
+            self.result_cache = ResultCache(os.path.join(config.dnn_cache_folder, "results.sqlite3"), self.modelKey())
+
+        self.stage_counts = Counter()
+
+        # Boxes per Frame (crop mode classifies every detected opening)
+        if config.resnet_mode == "crop" and local_models:
+            set_max_detections(self.gdino_model, config.crop_max_boxes)
+
+        # Decoder Capacity (queries / decoder layers)
+        if config.backend == "pytorch" and local_models:
+            self.setDecoderCapacity(config.gdino_num_queries, config.gdino_decoder_layers)
+
+        # Precision (before fork, workers inherit the wrapped modules)
+        self.precision_modules = []
+        if local_models:
+            self.setPrecision(config.precision, config.precision_gdino_modules, config.precision_resnet_modules)
+
+        # Compiled Mode (after precision, before fork)
+        self.compiled_forwards = []
+        if config.compile_mode != "none" and config.backend == "pytorch" and local_models:
+            self.reportProgress("Compiling models")
+            self.compileModels(gdino_checkpoint_hash, resnet_checkpoint_hash)
+
+        # CPU Process Pool (fork, shared weights, onnxruntime has its own thread pool)
+        self.inference_pool = None
+        if config.backend == "pytorch" and config.device == 'cpu' and config.cpu_workers > 1 and local_models:
+            if fork_available():
+                self.reportProgress("Starting worker processes")
+                shared_models = [self.gdino_model, self.resnet_model.model]
+                if self.presence_gate is not None:
+                    shared_models.append(self.presence_gate.model)
+                self.inference_pool = InferencePool(config.cpu_workers, self.inferImagesLocal, shared_models)
+            else:
+                print("fork is not available on this platform. Run inference in a single process.")
+
+    def reportProgress(self, message):
+        if self.progress is not None:
+            self.progress(message)
+
+    def modelKey(self):
+        # Hash of the Grounding DINO and ResNet checkpoints (the result cache drops entries of other keys)
+        config = self.config
+        checkpoint_paths = [config.gdino_checkpoint_path, config.resnet_checkpoint_path]
+        checkpoint_hashes = [checkpoint_hash(path, config.dnn_cache_folder) for path in checkpoint_paths]
+        return hashlib.sha1("\0".join(checkpoint_hashes).encode("utf-8")).hexdigest()
+
+    def optionalCheckpointHashes(self):
+        # Short hashes of the optional models in use (presence gate, INT8 ResNet), part of variantKey
+        config = self.config
+        checkpoint_paths = {}
+        if config.cascade:
+            checkpoint_paths["cascade"] = config.cascade_checkpoint_path
+        if config.resnet_int8 and os.path.exists(config.resnet_int8_path):
+            checkpoint_paths["resnet_int8"] = config.resnet_int8_path
+
+        hashes = {}
+        for name, path in checkpoint_paths.items():
+            if path not in self._optional_checkpoint_hashes:
+                self._optional_checkpoint_hashes[path] = checkpoint_hash(path, config.dnn_cache_folder)[:12]
+            hashes[name] = self._optional_checkpoint_hashes[path]
+        return hashes
+
+    def serverKey(self):
+        # Models and load-time settings a model server must share with its clients
+        # (per-call settings are sent with every request, see inferKwargs)
+        config = self.config
+        return (self.modelKey(), tuple(self.optionalCheckpointHashes().items()), config.backend, config.resnet_mode, config.crop_margin, config.crop_max_boxes,
+                config.cascade and config.cascade_input_size, config.gdino_num_queries, config.gdino_decoder_layers,
+                config.bert_int8, config.resnet_int8, config.precision, tuple(config.precision_gdino_modules),
+                tuple(config.precision_resnet_modules), self.tiling())
+
+    def modelConfigPath(self, config_path):
+        # Inference-only config (no gradient checkpointing, train-only modules, dataset imports)
+        if not self.config.inference_config:
+            return config_path
+        return compile_inference_config(config_path, self.config.dnn_cache_folder)
+
+    def loadTorchModels(self, gdino_checkpoint_hash):
+        config = self.config
+        self.reportProgress("Loading Grounding DINO")
+        self.gdino_model = init_detector(self.gdino_config_path, config.gdino_checkpoint_path, device=config.device)
+
+        # Text Prompt Cache (BERT output reused across images and restarts)
+        self.prompt_cache = PromptCache(
+            self.gdino_model, config.dnn_cache_folder, config.gdino_checkpoint_path, gdino_checkpoint_hash
+        )
+        if (config.bert_int8 or config.resnet_int8) and config.device != 'cpu':
+            print("INT8 models run on CPU only. Use fp32 models.")
+            config.bert_int8 = config.resnet_int8 = False
+        if config.bert_int8:
+            self.prompt_cache.setLanguageModelTransform(
+                lambda language_model: load_quantized_language_model(language_model, config.bert_int8_path),
+                "bert_int8"
+            )
+        text_prompt, custom_entities = self.detectorPrompt()
+        self.reportProgress("Encoding text prompt")
+        if config.frozen_prompts:
+            # Frozen Prompt Mode (BERT unloaded after precomputing)
+            # Label decision mode always prompts the detector classes
+            frozen_prompts = [text_prompt] if config.label_decision else config.frozen_prompts
+            self.prompt_cache.freeze(frozen_prompts, lazy_reload=config.frozen_prompt_lazy_reload,
+                                     custom_entities=custom_entities)
+        else:
+            self.prompt_cache.warmup(text_prompt, custom_entities)
+
+        self.reportProgress("Loading ResNet")
+        self.resnet_model = ImageClassificationInferencer(
+            model=self.resnet_config_path,
+            pretrained=config.resnet_checkpoint_path,
+            device=config.device
+        )
+        if config.resnet_int8:
+            if os.path.exists(config.resnet_int8_path):
+                self.resnet_model.model.backbone = load_quantized_resnet_backbone(config.resnet_int8_path)
+            else:
+                print(f"{config.resnet_int8_path} not found (run `pguard quantize`). Use fp32 ResNet.")
+                config.resnet_int8 = False
+
+    def loadOnnxModels(self, gdino_checkpoint_hash, resnet_checkpoint_hash):
+        # Graphs made by `pguard export-onnx`, text features are baked into the detector graphs
+        config = self.config
+        if config.device != 'cpu' or config.precision != "fp32" or config.bert_int8 or config.resnet_int8:
+            print("onnxruntime backend runs the exported fp32 graphs on CPU. Ignore device / precision / INT8.")
+            config.device = 'cpu'
+            config.precision = "fp32"
+            config.bert_int8 = config.resnet_int8 = False
+
+        self.reportProgress("Loading ONNX models")
+        threads = dict(intra_op_threads=config.onnx_intra_op_threads, inter_op_threads=config.onnx_inter_op_threads)
+        self.gdino_model = OnnxDetector(self.gdino_config_path, config.onnx_folder, gdino_checkpoint_hash, **threads)
+        self.prompt_cache = None
+        self.resnet_model = OnnxClassifier(self.resnet_config_path, config.onnx_folder, resnet_checkpoint_hash,
+                                           **threads)
+
+    def exportOnnx(self, sample_paths):
+        """Export the ResNet and Grounding DINO (current prompt and resolution profile) to config.onnx_folder"""
+        onnx_paths = [export_classifier(
+            self.resnet_model, self.config.onnx_folder,
+            checkpoint_hash(self.config.resnet_checkpoint_path, self.config.dnn_cache_folder)
+        )]
+
+        # One detector graph per resized input shape (same original size -> same shape)
+        text_prompt, custom_entities = self.detectorPrompt()
+        gdino_checkpoint_hash = checkpoint_hash(self.config.gdino_checkpoint_path, self.config.dnn_cache_folder)
+        image_sizes = set()
+        for image_path in sample_paths:
+            with Image.open(image_path) as image:
+                if image.size in image_sizes:
+                    continue
+                image_sizes.add(image.size)
+            onnx_path, _ = export_detector(
+                self.gdino_model, self.prompt_cache, text_prompt, custom_entities, np.array(Image.open(image_path)),
+                self.config.onnx_folder, gdino_checkpoint_hash, test_pipeline=self.detectorPipeline()
+            )
+            onnx_paths.append(onnx_path)
+        return onnx_paths
+
+    def compileModels(self, gdino_checkpoint_hash, resnet_checkpoint_hash):
+        config = self.config
+        if config.compile_mode == "torch_compile":
+            enable_compile_cache(config.dnn_cache_folder)
+
+        cache_dir = os.path.join(config.dnn_cache_folder, "compiled")
+        self.compiled_forwards = (
+            apply_compile(self.gdino_model, config.compile_gdino_modules, config.compile_mode, cache_dir,
+                          f"gdino\0{gdino_checkpoint_hash}\0{self.variantKey()}")
+            + apply_compile(self.resnet_model.model, config.compile_resnet_modules, config.compile_mode, cache_dir,
+                            f"resnet\0{resnet_checkpoint_hash}\0{self.variantKey()}")
+        )
+        for compiled_forward in self.compiled_forwards:
+            compiled_forward.warmup()
+
+    def setDecoderCapacity(self, num_queries=None, num_decoder_layers=None):
+        # In process only, forked workers keep the capacity they were forked with
+        set_decoder_capacity(self.gdino_model, num_queries, num_decoder_layers)
+        self.config.gdino_num_queries = num_queries
+        self.config.gdino_decoder_layers = num_decoder_layers
+
+    def setPrecision(self, precision, gdino_modules, resnet_modules):
+        restore_module_precision(self.precision_modules)
+        if self.config.backend != "pytorch":
+            return
+        self.config.precision = precision
+        self.config.precision_gdino_modules = list(gdino_modules)
+        self.config.precision_resnet_modules = list(resnet_modules)
+
+        self.precision_modules = (apply_module_precision(self.gdino_model, gdino_modules, precision)
+                                  + apply_module_precision(self.resnet_model.model, resnet_modules, precision))
+        if self.presence_gate is not None:
+            self.precision_modules += apply_module_precision(self.presence_gate.model, ["backbone"], precision)
+
+    def checkPrompt(self):
+        # Raises PromptNotCachedError in frozen prompt mode (or if the prompt is not exported to ONNX)
+        if self.model_client is not None:
+            self.model_client.call("check_prompt", *self.detectorPrompt())
+        else:
+            self.checkDetectorPrompt(*self.detectorPrompt())
+
+    def checkDetectorPrompt(self, text_prompt, custom_entities):
+        if self.prompt_cache is None:
+            self.gdino_model.checkPrompt(text_prompt, custom_entities)
+        else:
+            self.prompt_cache.warmup(text_prompt, custom_entities)
+
+    def detectorPipeline(self, resolution_profile=None):
+        # Test pipeline of a resolution profile (built once per process)
+        resolution_profile = self.config.resolution_profile if resolution_profile is None else resolution_profile
+        if resolution_profile not in self._gdino_pipelines:
+            self._gdino_pipelines[resolution_profile] = build_detector_pipeline(
+                self.gdino_model, RESOLUTION_PROFILES[resolution_profile])
+        return self._gdino_pipelines[resolution_profile]
+
+    def detectorPrompt(self):
+        """-> (Grounding DINO text prompt, custom_entities)"""
+        if self.config.label_decision:
+            return ". ".join(self.config.detector_label_codes), True
+        return self.config.text_prompt, False
+
+    def tiling(self):
+        # infer_images tiling (None: whole frames)
+        if not self.config.tiled:
+            return None
+        return dict(tile_size=self.config.tile_size, tile_overlap=self.config.tile_overlap,
+                    batch_size=self.config.tile_batch_size, full_frame=self.config.tile_full_frame)
+
+    def labelPolicy(self):
+        # make_result label_policy: [(resnet code, margin)] in detector label order
+        if not self.config.label_decision:
+            return None
+        return [(code, self.config.detector_label_margins[class_name])
+                for class_name, code in self.config.detector_label_codes.items()]
+
+    def run(self, image_paths):
+        """image_paths may include videos, sampled every config.video_sample_interval seconds
+
+        Video frames are keyed "<video path>#t=<seconds>" (pguard.video.frame_key) in image_path.
+        """
+        self.stage_counts = Counter()
+        duplicate_index = None
+        if self.config.dedup:
+            duplicate_index = NearDuplicateIndex(self.config.dedup_max_distance, self.config.dedup_window)
+
+        for chunk_paths, chunk_images in self.iterChunks(image_paths):
+            if duplicate_index is None:
+                chunk_results = self.inferImages(chunk_paths, chunk_images)
+            else:
+                chunk_results = self.inferImagesDeduplicated(chunk_paths, chunk_images, duplicate_index)
+            for result in chunk_results:
+                self.countStage(result)
+                yield result
+
+    def iterChunks(self, image_paths):
+        # (image paths, None) chunks of image files, (frame keys, frames) chunks of streamed video frames
+        chunk_size = self.config.inference_chunk_size
+        chunk_paths = []
+        for image_path in image_paths:
+            if not is_video(image_path):
+                chunk_paths.append(image_path)
+                if len(chunk_paths) == chunk_size:
+                    yield chunk_paths, None
+                    chunk_paths = []
+                continue
+
+            if len(chunk_paths) >= 1:
+                yield chunk_paths, None
+                chunk_paths = []
+            frame_keys, frames = [], []
+            for timestamp, frame in sample_video_frames(image_path, self.config.video_sample_interval):
+                frame_keys.append(frame_key(image_path, timestamp))
+                frames.append(frame)
+                if len(frame_keys) == chunk_size:
+                    yield frame_keys, frames
+                    frame_keys, frames = [], []
+            if len(frame_keys) >= 1:
+                yield frame_keys, frames
+
+        if len(chunk_paths) >= 1:
+            yield chunk_paths, None
+
+    def inferImagesDeduplicated(self, image_paths, images, duplicate_index):
+        """inferImages of the representative frames, near duplicates inherit their results"""
+        if images is None:
+            images = [None] * len(image_paths)
+
+        # Perceptual Hash (reduced decode) -> representative of each frame
+        matches = [duplicate_index.match(dhash(image_path if image is None else image), image_path)
+                   for image_path, image in zip(image_paths, images)]
+        infer_idxs = [idx for idx, (_, duplicate) in enumerate(matches) if not duplicate]
+        infer_images = [images[idx] for idx in infer_idxs]
+        infer_results = self.inferImages([image_paths[idx] for idx in infer_idxs],
+                                         infer_images if any(image is not None for image in infer_images) else None)
+
+        results = [None] * len(image_paths)
+        for idx, result in zip(infer_idxs, infer_results):
+            results[idx] = result
+            matches[idx][0].result = result
+
+        # Near Duplicates (representative of this or an earlier chunk)
+        for idx, (representative, duplicate) in enumerate(matches):
+            if duplicate:
+                result = representative.result
+                results[idx] = make_result(image_paths[idx], result["dino_raw"], self.config.score_thr,
+                                           result["resnet_code"], copy_box_codes(result["resnet_box_codes"]),
+                                           result["cascade_rejected"], label_policy=self.labelPolicy(),
+                                           duplicate_of=result["image_path"])
+        return results
+
+    def countStage(self, result):
+        self.stage_counts["frames"] += 1
+        if result["decided_by"] == "duplicate":
+            self.stage_counts["duplicates"] += 1
+        elif result["decided_by"] == "cascade":
+            self.stage_counts["cascade_rejected"] += 1
+        elif result["decided_by"] == "detector":
+            self.stage_counts["detector_rejected"] += 1
+        elif result["decided_by"] == "dino_label":
+            self.stage_counts["label_decided"] += 1
+        else:
+            self.stage_counts["classified"] += 1
+
+    def inferImages(self, image_paths, images=None):
+        # Decoded video frames have no file to hash, they are not cached
+        if self.result_cache is None or images is not None:
+            return self.inferImagesUncached(image_paths, images)
+
+        text_prompt, _ = self.detectorPrompt()
+        image_hashes = [file_hash(image_path) for image_path in image_paths]
+        variant = self.variantKey()
+        entries = self.result_cache.get(image_hashes, text_prompt, variant)
+
+        # New or Modified Images -> Models
+        results = [None] * len(image_paths)
+        miss_idxs = [idx for idx, entry in enumerate(entries) if entry is None]
+        miss_results = self.inferImagesUncached([image_paths[idx] for idx in miss_idxs])
+        for idx, result in zip(miss_idxs, miss_results):
+            results[idx] = result
+
+        # Cached Images -> Current Threshold (ResNet only if not classified before)
+        hit_idxs = [idx for idx, entry in enumerate(entries) if entry is not None]
+        self.stage_counts["cache_hits"] += len(hit_idxs)
+        for idx in hit_idxs:
+            dino_raw = entries[idx]["dino_raw"]
+            resnet_box_codes = entries[idx]["resnet_box_codes"]
+            if resnet_box_codes is None:
+                resnet_box_codes = initial_box_codes(dino_raw, self.config.resnet_mode)
+            results[idx] = make_result(image_paths[idx], dino_raw, self.config.score_thr,
+                                       entries[idx]["resnet_code"], resnet_box_codes,
+                                       cascade_rejected=entries[idx]["cascade_rejected"],
+                                       label_policy=self.labelPolicy())
+        hit_results = [results[idx] for idx in hit_idxs]
+        classified_idxs = [hit_idxs[idx] for idx in self.classifyResults(hit_results)]
+
+        self.result_cache.put(
+            [(image_hashes[idx], results[idx]) for idx in miss_idxs + classified_idxs], text_prompt, variant
+        )
+        return results
+
+    def variantKey(self):
+        # Inference settings that change cached outputs
+        checkpoint_hashes = self.optionalCheckpointHashes()
+        variant = f"resnet={self.config.resnet_mode}"
+        if self.config.resnet_mode == "crop":
+            variant += f",margin={self.config.crop_margin},boxes={self.config.crop_max_boxes}"
+        if self.config.cascade:
+            variant += (f",cascade={self.config.cascade_threshold}@{self.config.cascade_input_size}"
+                        f":{checkpoint_hashes['cascade']}")
+        if self.config.label_decision:
+            variant += f",labels={self.labelPolicy()}"
+        if self.config.gdino_num_queries is not None or self.config.gdino_decoder_layers is not None:
+            variant += f",decoder={self.config.gdino_num_queries}x{self.config.gdino_decoder_layers}"
+        if self.config.tiled:
+            variant += (f",tiles={self.config.tile_size}/{self.config.tile_overlap}"
+                        f"{'+frame' if self.config.tile_full_frame else ''}")
+        if self.config.resolution_profile != "full":
+            variant += f",resolution={RESOLUTION_PROFILES[self.config.resolution_profile]}"
+        if self.config.backend != "pytorch":
+            variant += f",backend={self.config.backend}"
+        if self.config.bert_int8 or self.config.resnet_int8:
+            variant += f",int8={'bert' if self.config.bert_int8 else ''}+{'resnet' if self.config.resnet_int8 else ''}"
+            if "resnet_int8" in checkpoint_hashes:
+                variant += f":{checkpoint_hashes['resnet_int8']}"
+        if self.config.precision != "fp32":
+            variant += (f",precision={self.config.precision}:{'+'.join(self.config.precision_gdino_modules)}"
+                        f":{'+'.join(self.config.precision_resnet_modules)}")
+        return variant
+
+    def rethreshold(self, results, score_thr=None):
+        """Re-filter results with a new threshold without running the detector
+
+        Positive results that were never classified get resnet None (see runClassification).
+        """
+        score_thr = self.config.score_thr if score_thr is None else score_thr
+        results_by_path = {result["image_path"]: result for result in results}
+        rethresholded = []
+        for result in results:
+            # Near duplicates take the codes of their representative (when it is among the results)
+            source = results_by_path.get(result["duplicate_of"], result)
+            rethresholded.append(make_result(
+                result["image_path"], result["dino_raw"], score_thr, source["resnet_code"],
+                copy_box_codes(source["resnet_box_codes"]), result["cascade_rejected"],
+                label_policy=self.labelPolicy(), duplicate_of=result["duplicate_of"]
+            ))
+        return rethresholded
+
+    def runClassification(self, results):
+        """Classify results with resnet None in batches, yields the updated results
+
+        Near duplicates whose representative is among the results are not classified,
+        they inherit its codes once it is.
+        """
+        pending_paths = {result["image_path"] for result in results}
+        duplicates = [result for result in results if result["duplicate_of"] in pending_paths]
+        results = [result for result in results if result["duplicate_of"] not in pending_paths]
+
+        for start in range(0, len(results), self.config.resnet_batch_size):
+            chunk = results[start:start + self.config.resnet_batch_size]
+            self.classifyResults(chunk)
+
+            cached_results = [result for result in chunk if parse_frame_key(result["image_path"]) is None]
+            if self.result_cache is not None and len(cached_results) >= 1:
+                self.result_cache.put(
+                    [(file_hash(result["image_path"]), result) for result in cached_results],
+                    self.detectorPrompt()[0], self.variantKey()
+                )
+            yield from chunk
+
+        representatives = {result["image_path"]: result for result in results}
+        for result in duplicates:
+            representative = representatives[result["duplicate_of"]]
+            result["resnet_code"] = representative["resnet_code"]
+            result["resnet_box_codes"] = copy_box_codes(representative["resnet_box_codes"])
+            result["resnet"] = representative["resnet"] # same detections, same kept boxes
+            yield result
+
+    def inferKwargs(self):
+        # Settings sent with every inferImagesLocal call (forked workers only see them as of fork)
+        text_prompt, custom_entities = self.detectorPrompt()
+        return dict(text_prompt=text_prompt, custom_entities=custom_entities, score_thr=self.config.score_thr,
+                    cascade_thr=self.config.cascade_threshold, label_policy=self.labelPolicy(),
+                    resolution_profile=self.config.resolution_profile)
+
+    def classifyResults(self, results):
+        """classify_results with this pipeline's ResNet (or the model server's), returns the updated indices"""
+        if self.model_client is None:
+            return classify_results(results, self.resnet_model, batch_size=self.config.resnet_batch_size,
+                                    crop_margin=self.config.crop_margin)
+
+        # The server resolves paths against its own working directory
+        server_results = [dict(result, image_path=os.path.abspath(result["image_path"])) for result in results]
+        classified_results, classified_idxs = self.model_client.call("classify", server_results)
+        for result, classified_result in zip(results, classified_results):
+            classified_result["image_path"] = result["image_path"]
+            result.update(classified_result) # in place, like classify_results
+        return classified_idxs
+
+    def inferImagesUncached(self, image_paths, images=None):
+        if self.model_client is not None:
+            # Absolute paths (and frame keys) for the server, results keep the paths as given
+            results = self.model_client.call("infer", [os.path.abspath(image_path) for image_path in image_paths],
+                                             self.inferKwargs(), images)
+            for image_path, result in zip(image_paths, results):
+                result["image_path"] = image_path
+            return results
+        return self.inferImagesWith(image_paths, self.inferKwargs(), images)
+
+    def inferImagesWith(self, image_paths, infer_kwargs, images=None):
+        # infer_kwargs: see inferKwargs (a model server runs each client's settings)
+        if self.inference_pool is not None:
+            return self.inference_pool.map(image_paths, images=images, **infer_kwargs)
+        return self.inferImagesLocal(image_paths, images=images, **infer_kwargs)
+
+    def inferImagesLocal(self, image_paths, text_prompt, custom_entities, score_thr, cascade_thr, label_policy,
+                         resolution_profile, images=None):
+        return infer_images(
+            image_paths, self.gdino_model, self.resnet_model, text_prompt, score_thr,
+            gdino_pipeline=self.detectorPipeline(resolution_profile),
+            gdino_batch_size=self.config.gdino_batch_size,
+            resnet_batch_size=self.config.resnet_batch_size,
+            resnet_mode=self.config.resnet_mode,
+            crop_margin=self.config.crop_margin,
+            presence_gate=self.presence_gate,
+            cascade_thr=cascade_thr,
+            cascade_batch_size=self.config.cascade_batch_size,
+            custom_entities=custom_entities,
+            label_policy=label_policy,
+            tiling=self.tiling(),
+            images=images
+        )
+
+    def calibrateCascade(self, image_paths, target_recall=0.99):
+        """Gate threshold keeping target_recall of the frames the detector finds positive
+
+        -> (threshold, recall, skip ratio). Runs the detector on every image (no cascade).
+        """
+        gate_scores = []
+        detector_positives = []
+        for start in range(0, len(image_paths), self.config.inference_chunk_size):
+            chunk = image_paths[start:start + self.config.inference_chunk_size]
+            images = [np.array(Image.open(image_path)) for image_path in chunk]
+            gate_scores += self.presence_gate.scores(images, batch_size=self.config.cascade_batch_size)
+
+            text_prompt, custom_entities = self.detectorPrompt()
+            dino_raw_list = detect_images(images, self.gdino_model, text_prompt, self.detectorPipeline(),
+                                          batch_size=self.config.gdino_batch_size, custom_entities=custom_entities)
+            detector_positives += [len(filter_detection_indices(dino_raw, self.config.score_thr)) >= 1
+                                   for dino_raw in dino_raw_list]
+
+        return calibrate_threshold(gate_scores, detector_positives, target_recall)
+
+    def validatePrecision(self, image_paths, precision, module_sets):
+        """fp32 vs reduced precision on image_paths (in process, result cache unused)
+
+        module_sets: list of (gdino modules, resnet modules) to test
+        -> (fp32 seconds, list of (gdino modules, resnet modules, compare_results report, seconds))
+        """
+        original = (self.config.precision, self.config.precision_gdino_modules, self.config.precision_resnet_modules)
+
+        reports = []
+        try:
+            self.setPrecision("fp32", [], [])
+            reference_results, fp32_seconds = self.timeInference(image_paths)
+
+            for gdino_modules, resnet_modules in module_sets:
+                self.setPrecision(precision, gdino_modules, resnet_modules)
+                results, seconds = self.timeInference(image_paths)
+                reports.append((gdino_modules, resnet_modules, compare_results(reference_results, results), seconds))
+        finally:
+            self.setPrecision(*original)
+
+        return fp32_seconds, reports
+
+    def saveInt8Models(self, calibration_paths):
+        """Dynamic INT8 BERT + static INT8 ResNet backbone calibrated on calibration_paths
+
+        Needs the fp32 models on CPU (not frozen). Saved at config.bert_int8_path / resnet_int8_path.
+        """
+        text_prompt, _ = self.detectorPrompt()
+        language_model = self.prompt_cache.languageModel([text_prompt])
+        torch.save(quantize_language_model(language_model).state_dict(), self.config.bert_int8_path)
+
+        calibration_images = [np.array(Image.open(image_path)) for image_path in calibration_paths]
+        resnet_backbone = quantize_resnet_backbone(self.resnet_model, calibration_images,
+                                                   batch_size=self.config.resnet_batch_size)
+        torch.jit.save(resnet_backbone, self.config.resnet_int8_path)
+
+    def benchmark(self, image_paths, repeat=5):
+        """Latency of the text branch, ResNet and the whole pipeline (models always run, no result cache)
+
+        -> (results, dict of seconds: text_branch per prompt, resnet / pipeline for all images)
+        text_branch is 0 with the onnxruntime backend (text features are part of the graph).
+        """
+        text_seconds = 0.0
+        if self.prompt_cache is not None:
+            text_prompt, custom_entities = self.detectorPrompt()
+            _, caption, _, _ = self.prompt_cache.get_tokens_positive_and_prompts(text_prompt, custom_entities)
+            language_model = self.prompt_cache.languageModel([caption])
+            start_time = time.perf_counter()
+            with torch.no_grad():
+                for _ in range(repeat):
+                    language_model([caption])
+            text_seconds = (time.perf_counter() - start_time) / repeat
+
+        images = [np.array(Image.open(image_path)) for image_path in image_paths]
+        start_time = time.perf_counter()
+        classify_images(self.resnet_model, images, batch_size=self.config.resnet_batch_size)
+        resnet_seconds = time.perf_counter() - start_time
+
+        results, pipeline_seconds = self.timeInference(image_paths)
+        return results, {"text_branch": text_seconds, "resnet": resnet_seconds, "pipeline": pipeline_seconds}
+
+    def timeInference(self, image_paths):
+        """Run the models on every image with the current settings (in process, no result cache)
+
+        -> (results, seconds)
+        """
+        start_time = time.perf_counter()
+        results = []
+        for start in range(0, len(image_paths), self.config.inference_chunk_size):
+            chunk = image_paths[start:start + self.config.inference_chunk_size]
+            results += self.inferImagesLocal(chunk, **self.inferKwargs())
+        return results, time.perf_counter() - start_time
+
+    def close(self):
+        if self.model_client is not None:
+            self.model_client.close()
+            self.model_client = None
+
+        if self.inference_pool is not None:
+            self.inference_pool.close()
+            self.inference_pool = None
+
+        if self.result_cache is not None:
+            self.result_cache.close()
+            self.result_cache = None
+
+
+def format_stage_counts(stage_counts):
+    return ", ".join(f"{key}={stage_counts.get(key, 0)}" for key in STAGE_COUNT_KEYS)
+
+
+def draw_result(image, bboxes, scores):
+    plot_image = image.copy()
+
+    for bbox, score in zip(bboxes, scores):
+        x1, y1, x2, y2 = bbox.astype(int)
+
+        text = f'비정상 개구부 {score:.2f}'
+
+        cv2.rectangle(plot_image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+
+        (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
+        cv2.rectangle(plot_image, (x1, y1 - 25), (x1 + w, y1 - 5), (0, 0, 255), -1)
+        cv2.putText(plot_image, text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+
+    return plot_image
+
+
+def save_result_image(result, dst_folder):
+    # Video frames are decoded again from the video (only the saved ones)
+    image = load_image(result["image_path"])
+    plot_image = draw_result(image, result["dino_bbox"], result["dino_score"])
+
+    image_name = result["image"]
+    if not image_name.endswith(IMAGE_EXTENSIONS):
+        image_name += ".jpg" # "<video>#t=<seconds>.jpg"
+    dst_image_path = os.path.join(dst_folder, image_name)
+    Image.fromarray(plot_image).save(dst_image_path)
+    return dst_image_path
+
+
+def result_to_record(result):
+    # JSON/CSV serializable form of a result dict
+    return {
+        "image": result["image"],
+        "image_path": result["image_path"],
+        "resnet": int(result["resnet"]),
+        "class": CLASSIFICATION_MAP[result["resnet"]],
+        "max_score": float(np.max(result["dino_score"])) if len(result["dino_score"]) >= 1 else 0.0,
+        "dino_bbox": np.asarray(result["dino_bbox"]).tolist(),
+        "dino_score": np.asarray(result["dino_score"]).tolist(),
+        "box_resnet": [result["resnet_box_codes"][idx] for idx in result["dino_keep"]]
+                      if result["resnet_box_codes"] is not None else None,
+        "decided_by": result["decided_by"],
+        "duplicate_of": result["duplicate_of"]
+    }
+
+
+def write_results_csv(results, path, append=False):
+    records = [result_to_record(result) for result in results]
+    fieldnames = ["image", "image_path", "resnet", "class", "max_score", "dino_bbox", "dino_score", "box_resnet",
+                  "decided_by", "duplicate_of"]
+    write_header = not (append and os.path.exists(path))
+    if not write_header:
+        # Keep the columns of the existing file (written by an older version)
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            fieldnames = next(csv.reader(f), fieldnames)
+
+    # utf-8-sig: Korean class names open correctly in Excel
+    with open(path, "a" if append else "w", newline="", encoding="utf-8-sig" if write_header else "utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        for record in records:
+            record["dino_bbox"] = json.dumps(record["dino_bbox"])
+            record["dino_score"] = json.dumps(record["dino_score"])
+            record["box_resnet"] = json.dumps(record["box_resnet"])
+            writer.writerow(record)
+
+
+def read_labels(path):
+    """CSV with image and label (or resnet, e.g. a reviewed results.csv) columns -> {image: resnet code}"""
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return {row["image"]: int(row["label"] if "label" in row else row["resnet"]) for row in csv.DictReader(f)}
+
+
+def write_results_json(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([result_to_record(result) for result in results], f, ensure_ascii=False, indent=2)
@@ -0,0 +1,95 @@
+import numpy as np
+import torch
+
+from .utils import compute_iou_np
+
+PRECISION_DTYPES = {"bf16": torch.bfloat16, "fp16": torch.float16}
+
+
+def _to_float32(value):
+    if isinstance(value, torch.Tensor):
+        return value.float() if value.is_floating_point() else value
+    elif isinstance(value, dict):
+        return {k: _to_float32(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return type(value)(_to_float32(v) for v in value)
+    return value
+
+
+def apply_module_precision(model, module_names, precision):
+    """Run the named submodules under autocast (bf16/fp16), their outputs cast back to fp32
+
+    Everything else (e.g. the BERT text branch, heads, post-processing) stays fp32.
+    TorchScript modules (e.g. the INT8 ResNet backbone) keep their own precision.
+    Returns the wrapped modules (see restore_module_precision).
+    """
+    if precision == "fp32":
+        return []
+
+    dtype = PRECISION_DTYPES[precision]
+    device_type = next(model.parameters()).device.type
+
+    modules = []
+    for module_name in module_names:
+        module = model.get_submodule(module_name)
+        if isinstance(module, torch.jit.ScriptModule):
+            continue
+        forward = module.forward
+
+        def autocast_forward(*args, _forward=forward, **kwargs):
+            with torch.autocast(device_type=device_type, dtype=dtype):
+                return _to_float32(_forward(*args, **kwargs))
+
+        module.forward = autocast_forward
+        modules.append(module)
+    return modules
+
+
+def restore_module_precision(modules):
+    for module in modules:
+        # Drop the instance attribute, the class forward is used again
+        del module.forward
+
+
+def compare_results(reference_results, results, iou_threshold=0.5):
+    """fp32 results vs reduced precision results of the same images
+
+    -> dict: decision agreement, box count mismatches, box recall (reference boxes
+    matched), mean IoU / max score difference of matched boxes, and the image
+    names whose decision changed
+    """
+    decision_changed = []
+    box_count_mismatches = 0
+    num_reference_boxes = 0
+    matched_ious = []
+    score_diffs = []
+
+    for reference, result in zip(reference_results, results):
+        if reference["resnet"] != result["resnet"]:
+            decision_changed.append(reference["image"])
+        if len(reference["dino_bbox"]) != len(result["dino_bbox"]):
+            box_count_mismatches += 1
+
+        # Greedy matching of kept boxes (reference order = score order)
+        num_reference_boxes += len(reference["dino_bbox"])
+        unmatched = list(range(len(result["dino_bbox"])))
+        for bbox, score in zip(reference["dino_bbox"], reference["dino_score"]):
+            if len(unmatched) == 0:
+                break
+            ious = compute_iou_np(bbox, np.asarray(result["dino_bbox"])[unmatched])
+            best = int(np.argmax(ious))
+            if ious[best] >= iou_threshold:
+                matched_ious.append(float(ious[best]))
+                score_diffs.append(abs(float(score) - float(result["dino_score"][unmatched[best]])))
+                unmatched.pop(best)
+
+    num_images = max(len(reference_results), 1)
+    return {
+        "images": len(reference_results),
+        "decision_agreement": 1.0 - len(decision_changed) / num_images,
+        "box_count_mismatches": box_count_mismatches,
+        "box_recall": len(matched_ious) / num_reference_boxes if num_reference_boxes else 1.0,
+        "mean_iou": float(np.mean(matched_ious)) if matched_ious else 1.0,
+        "max_score_diff": float(np.max(score_diffs)) if score_diffs else 0.0,
+        "decision_changed": decision_changed
+    }
@@ -0,0 +1,172 @@
+import gc
+import hashlib
+import os
+
+import torch
+from torch import nn
+from mmdet.registry import MODELS
+from mmengine.runner.checkpoint import CheckpointLoader
+
+
+class PromptNotCachedError(RuntimeError):
+    pass
+
+
+class CachedLanguageModel(nn.Module):
+    """GroundingDINO.language_model 대체: 동일 프롬프트의 BERT 출력을 재사용"""
+
+    def __init__(self, language_model, prompt_cache):
+        super().__init__()
+        self.language_model = language_model
+        self.tokenizer = language_model.tokenizer
+        self.prompt_cache = prompt_cache
+
+    def forward(self, captions, **kwargs):
+        if len(captions) == 0 or len(set(captions)) != 1 or kwargs:
+            return self.prompt_cache.languageModel(captions)(captions, **kwargs)
+
+        text_dict = self.prompt_cache.getTextFeatures(captions[0])
+        return {key: value.repeat(len(captions), *([1] * (value.dim() - 1))) for key, value in text_dict.items()}
+
+
+class PromptCache():
+    """Grounding DINO text branch cache (memory + disk)
+
+    key: sha1(kind, prompt, checkpoint sha256[, language model variant])
+    - tokens: get_tokens_positive_and_prompts output (positive map, entities)
+    - text: language model output (embedded, masks, hidden, position_ids, text_token_mask)
+    """
+
+    def __init__(self, model, cache_dir, checkpoint_path, checkpoint_sha256):
+        self.model = model
+        self.cache_dir = cache_dir
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_sha256 = checkpoint_sha256
+        self._memory = {}
+
+        # Language Model Transform (e.g. INT8), also applied after a lazy reload
+        self.language_model_transform = None
+        self.language_model_variant = ""
+
+        # Frozen Prompt Mode
+        self.frozen_prompts = None
+        self.lazy_reload = False
+
+        # Install on Model
+        self._language_model = model.language_model
+        self._get_tokens_positive_and_prompts = model.get_tokens_positive_and_prompts
+        model.language_model = CachedLanguageModel(self._language_model, self)
+        model.get_tokens_positive_and_prompts = self.get_tokens_positive_and_prompts
+
+    def get_tokens_positive_and_prompts(self, original_caption, custom_entities=False,
+                                        enhanced_text_prompt=None, tokens_positive=None):
+        # Same signature as GroundingDINO.get_tokens_positive_and_prompts
+        if not isinstance(original_caption, str) or enhanced_text_prompt is not None or tokens_positive is not None:
+            return self._get_tokens_positive_and_prompts(
+                original_caption, custom_entities, enhanced_text_prompt, tokens_positive)
+
+        return self._load(
+            "tokens", f"{original_caption}|{custom_entities}",
+            lambda: self._get_tokens_positive_and_prompts(original_caption, custom_entities)
+        )
+
+    def getTextFeatures(self, caption):
+        def compute():
+            language_model = self.languageModel([caption])
+            with torch.no_grad():
+                return language_model([caption])
+        return self._load("text", caption, compute)
+
+    def warmup(self, text_prompt, custom_entities=False):
+        _, caption_string, _, _ = self.get_tokens_positive_and_prompts(text_prompt, custom_entities)
+        self.getTextFeatures(caption_string)
+
+    def setLanguageModelTransform(self, transform, variant):
+        """transform: fp32 language model -> language model used for new prompts
+
+        variant is part of the cache key, features of the fp32 model are not reused.
+        """
+        self.language_model_transform = transform
+        self.language_model_variant = variant
+        if self._language_model is not None:
+            self._language_model = transform(self._language_model)
+            self.model.language_model.language_model = self._language_model
+
+    def isFrozen(self):
+        return self._language_model is None
+
+    def freeze(self, text_prompts, lazy_reload=False, custom_entities=False):
+        """Precompute text_prompts, then drop the BERT weights from memory
+
+        Prompts outside text_prompts raise PromptNotCachedError, or reload the
+        language model from the checkpoint when lazy_reload is set.
+        """
+        for text_prompt in text_prompts:
+            self.warmup(text_prompt, custom_entities)
+
+        self.frozen_prompts = list(text_prompts)
+        self.lazy_reload = lazy_reload
+        self._language_model = None
+        self.model.language_model.language_model = None
+
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def languageModel(self, captions):
+        if self._language_model is not None:
+            return self._language_model
+
+        if not self.lazy_reload:
+            raise PromptNotCachedError(
+                f"Text prompt {captions} is not precomputed in frozen prompt mode "
+                f"(available: {self.frozen_prompts})")
+
+        print(f"Reload language model for text prompt: {captions}")
+        self._language_model = self._buildLanguageModel()
+        self.model.language_model.language_model = self._language_model
+        return self._language_model
+
+    def _buildLanguageModel(self):
+        language_model = MODELS.build(self.model.cfg.model.language_model)
+
+        checkpoint = CheckpointLoader.load_checkpoint(self.checkpoint_path, map_location="cpu")
+        state_dict = checkpoint.get("state_dict", checkpoint)
+        prefix = "language_model."
+        language_model.load_state_dict(
+            {key[len(prefix):]: value for key, value in state_dict.items() if key.startswith(prefix)}, strict=False)
+
+        language_model = language_model.to(self.model.data_preprocessor.device).eval()
+        if self.language_model_transform is not None:
+            language_model = self.language_model_transform(language_model)
+        return language_model
+
+    def _load(self, kind, prompt, compute_fn):
+        key_text = f"{kind}\0{prompt}\0{self.checkpoint_sha256}"
+        if self.language_model_variant:
+            key_text += f"\0{self.language_model_variant}"
+        key = hashlib.sha1(key_text.encode("utf-8")).hexdigest()
+        if key in self._memory:
+            return self._memory[key]
+
+        device = self.model.data_preprocessor.device
+        cache_path = os.path.join(self.cache_dir, f"prompt_{kind}_{key}.pth")
+        if os.path.exists(cache_path):
+            value = torch.load(cache_path, map_location=device)
+        else:
+            value = compute_fn()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            torch.save(_to_device(value, "cpu"), cache_path)
+
+        self._memory[key] = value
+        return value
+
+
+def _to_device(value, device):
+    if isinstance(value, torch.Tensor):
+        return value.to(device)
+    elif isinstance(value, dict):
+        return {k: _to_device(v, device) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return type(value)(_to_device(v, device) for v in value)
+    return value
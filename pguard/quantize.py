@@ -0,0 +1,58 @@
+import copy
+import os
+
+import torch
+from torch import nn
+
+
+def quantization_engine():
+    engines = torch.backends.quantized.supported_engines
+    return "x86" if "x86" in engines else "fbgemm"
+
+
+def quantize_language_model(language_model):
+    """BERT text branch -> dynamic INT8 (Linear weights int8, activations quantized per call)"""
+    return torch.ao.quantization.quantize_dynamic(language_model, {nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized_language_model(language_model, path):
+    """fp32 language model -> dynamic INT8 model with the weights saved at path"""
+    quantized = quantize_language_model(language_model)
+    if os.path.exists(path):
+        quantized.load_state_dict(torch.load(path, map_location="cpu"))
+    return quantized
+
+
+def quantize_resnet_backbone(resnet_model, calibration_images, batch_size=32, input_size=224):
+    """Static INT8 of the ResNet backbone (FX graph mode), calibrated on calibration_images
+
+    resnet_model: ImageClassificationInferencer on CPU. The observers see the
+    calibration images through the normal inferencer preprocessing.
+    Neck and head stay fp32. Returns a TorchScript module (see torch.jit.save).
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = quantization_engine()
+    torch.backends.quantized.engine = engine
+
+    model = resnet_model.model
+    backbone = model.backbone
+    example_inputs = (torch.randn(1, 3, input_size, input_size),)
+    prepared = prepare_fx(copy.deepcopy(backbone).eval(), get_default_qconfig_mapping(engine), example_inputs)
+
+    # Calibration
+    model.backbone = prepared
+    try:
+        resnet_model(calibration_images, batch_size=batch_size)
+    finally:
+        model.backbone = backbone
+
+    quantized = convert_fx(prepared)
+    with torch.no_grad():
+        return torch.jit.trace(quantized, example_inputs)
+
+
+def load_quantized_resnet_backbone(path):
+    torch.backends.quantized.engine = quantization_engine()
+    return torch.jit.load(path, map_location="cpu")
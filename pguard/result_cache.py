@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+# Bump when the table layout changes (older tables are dropped)
+SCHEMA_VERSION = 3
+
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ResultCache():
+    """On-disk result cache keyed by image content hash
+
+    Stores the raw (pre-threshold) Grounding DINO output and the ResNet codes
+    per (image hash, prompt, model key, variant), and whether the presence
+    gate rejected the image before the detector. model_key combines the
+    checkpoint hashes; entries made with other checkpoints are dropped when
+    opened. variant describes the inference settings that change the outputs.
+    """
+
+    def __init__(self, db_path, model_key):
+        self.db_path = db_path
+        self.model_key = model_key
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self.conn:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS results")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "image_hash TEXT, prompt TEXT, model_key TEXT, variant TEXT, "
+                "dino_raw TEXT, resnet INTEGER, resnet_boxes TEXT, cascade_rejected INTEGER, "
+                "PRIMARY KEY (image_hash, prompt, model_key, variant))"
+            )
+            # Invalidate results of older checkpoints
+            self.conn.execute("DELETE FROM results WHERE model_key != ?", (model_key,))
+
+    def get(self, image_hashes, prompt, variant=""):
+        """list of image hash -> list of entry dict (dino_raw, resnet_code, resnet_box_codes, cascade_rejected) or None"""
+        if len(image_hashes) == 0:
+            return []
+
+        placeholders = ",".join("?" * len(image_hashes))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT image_hash, dino_raw, resnet, resnet_boxes, cascade_rejected FROM results "
+                f"WHERE prompt = ? AND model_key = ? AND variant = ? AND image_hash IN ({placeholders})",
+                (prompt, self.model_key, variant, *image_hashes)
+            ).fetchall()
+
+        entries = {
+            image_hash: {
+                "dino_raw": _decode_raw(dino_raw),
+                "resnet_code": resnet,
+                "resnet_box_codes": json.loads(resnet_boxes) if resnet_boxes is not None else None,
+                "cascade_rejected": bool(cascade_rejected)
+            }
+            for image_hash, dino_raw, resnet, resnet_boxes, cascade_rejected in rows
+        }
+        return [entries.get(image_hash) for image_hash in image_hashes]
+
+    def put(self, items, prompt, variant=""):
+        """items: list of (image hash, result dict)"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(image_hash, prompt, self.model_key, variant, _encode_raw(result["dino_raw"]), result["resnet_code"],
+                  json.dumps(result["resnet_box_codes"]) if result["resnet_box_codes"] is not None else None,
+                  int(result["cascade_rejected"]))
+                 for image_hash, result in items]
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def _encode_raw(dino_raw):
+    return json.dumps({key: value.tolist() for key, value in dino_raw.items()})
+
+
+def _decode_raw(text):
+    dino_raw = json.loads(text)
+    return {
+        "bboxes": np.asarray(dino_raw["bboxes"], dtype=np.float32).reshape(-1, 4),
+        "scores": np.asarray(dino_raw["scores"], dtype=np.float32),
+        "labels": np.asarray(dino_raw["labels"], dtype=np.int64)
+    }
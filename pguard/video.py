@@ -0,0 +1,97 @@
+import os
+
+import cv2
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Sampled frames are keyed "<video path>#t=<seconds>" wherever an image path is expected
+FRAME_KEY_SEPARATOR = "#t="
+
+
+def is_video(path):
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def frame_key(video_path, timestamp):
+    return f"{video_path}{FRAME_KEY_SEPARATOR}{timestamp:.3f}"
+
+
+def parse_frame_key(key):
+    """-> (video path, timestamp [s]), None if key is not a video frame key"""
+    video_path, separator, timestamp = key.rpartition(FRAME_KEY_SEPARATOR)
+    if separator == "" or not is_video(video_path):
+        return None
+    return video_path, float(timestamp)
+
+
+def _fps(capture):
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    return fps if fps > 0 else 30.0 # some containers do not report it
+
+
+def _sample_step(frame_idx, fps, interval_seconds, next_timestamp):
+    # Sampling rule of sample_video_frames -> (frame sampled, next sample time)
+    timestamp = frame_idx / fps
+    if timestamp + 0.5 / fps < next_timestamp:
+        return False, next_timestamp
+    while next_timestamp <= timestamp + 0.5 / fps:
+        next_timestamp += interval_seconds
+    return True, next_timestamp
+
+
+def sample_video_frames(video_path, interval_seconds=1.0):
+    """Yields (timestamp [s], RGB frame) every interval_seconds, decoding the video sequentially
+
+    Frames between samples are only grabbed (never converted to an ndarray), so memory
+    holds one frame at a time. Timestamps are frame index / fps, see read_video_frame.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        print(f"Cannot open video: {video_path}")
+        return
+
+    fps = _fps(capture)
+    frame_idx = 0
+    next_timestamp = 0.0
+    try:
+        while capture.grab():
+            timestamp = frame_idx / fps
+            sampled, next_timestamp = _sample_step(frame_idx, fps, interval_seconds, next_timestamp)
+            frame_idx += 1
+            if not sampled:
+                continue
+
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            yield timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
+
+
+def video_sample_count(video_path, interval_seconds=1.0):
+    """Number of frames sample_video_frames yields (from the container frame count)"""
+    capture = cv2.VideoCapture(video_path)
+    frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+    fps = _fps(capture)
+    capture.release()
+    sample_count = 0
+    next_timestamp = 0.0
+    for frame_idx in range(int(frame_count)):
+        sampled, next_timestamp = _sample_step(frame_idx, fps, interval_seconds, next_timestamp)
+        sample_count += sampled
+    return sample_count
+
+
+def read_video_frame(key):
+    """RGB frame of a frame key (seek + decode of that frame only, e.g. to export a keyframe)"""
+    video_path, timestamp = parse_frame_key(key)
+    capture = cv2.VideoCapture(video_path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, round(timestamp * _fps(capture)))
+        ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        raise FileNotFoundError(f"Cannot read frame {os.path.basename(key)}")
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
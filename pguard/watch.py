@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import time
+
+from PIL import Image
+
+from .pipeline import IMAGE_EXTENSIONS
+
+
+def watch_index_path(cache_folder, folder):
+    folder_key = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()
+    return os.path.join(cache_folder, f"watch_{folder_key}.json")
+
+
+def is_image_readable(path):
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        return True
+    except Exception:
+        return False
+
+
+class FolderWatcher():
+    """Finds images added to a folder since the last run
+
+    A file is ready once its (size, mtime) has not changed for settle_seconds
+    and it opens as an image, so partially written uploads are skipped until
+    complete. Processed files are kept in a JSON index (name -> [size, mtime_ns])
+    so restarts do not process them again.
+    """
+
+    def __init__(self, folder, index_path, settle_seconds=2.0):
+        self.folder = folder
+        self.index_path = index_path
+        self.settle_seconds = settle_seconds
+
+        self.processed = {}
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                self.processed = json.load(f)
+
+        # name -> (size, mtime_ns, time of last change)
+        self._pending = {}
+
+    def hasPending(self):
+        return len(self._pending) >= 1
+
+    def poll(self):
+        """-> list of new image paths that are ready to process"""
+        now = time.monotonic()
+        ready_paths = []
+
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.endswith(IMAGE_EXTENSIONS):
+                continue
+
+            stat = entry.stat()
+            signature = [stat.st_size, stat.st_mtime_ns]
+            if self.processed.get(entry.name) == signature:
+                continue
+
+            pending = self._pending.get(entry.name)
+            if pending is None or list(pending[:2]) != signature:
+                # New or still being written
+                self._pending[entry.name] = (stat.st_size, stat.st_mtime_ns, now)
+                continue
+
+            if now - pending[2] >= self.settle_seconds and is_image_readable(entry.path):
+                del self._pending[entry.name]
+                ready_paths.append(entry.path)
+
+        return sorted(ready_paths)
+
+    def markProcessed(self, image_paths):
+        for image_path in image_paths:
+            try:
+                stat = os.stat(image_path)
+            except FileNotFoundError:
+                continue # deleted or renamed in the shared folder after processing
+            self.processed[os.path.basename(image_path)] = [stat.st_size, stat.st_mtime_ns]
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.processed, f)
+        os.replace(tmp_path, self.index_path)
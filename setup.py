@@ -12,6 +12,14 @@ target = Executable(
     icon="icon.ico"
 )
 
+# TARGET / HEADLESS COMMAND LINE (pguard run <folder>)
+cli_target = Executable(
+    script="pguard/__main__.py",
+    base=None,
+    target_name="pguard",
+    icon="icon.ico"
+)
+
 # SETUP CX FREEZE
 setup(
     name = "PyDracula",
@@ -19,6 +27,6 @@ setup(
     description = "Modern GUI for Python applications",
     author = "Wanderson M. Pimenta",
     options = {'build_exe' : {'include_files' : files}},
-    executables = [target]
+    executables = [target, cli_target]
     
 )